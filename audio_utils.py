@@ -0,0 +1,352 @@
+import io
+import os
+import re
+import struct
+import subprocess
+import tempfile
+import wave
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import config
+import settings
+
+SAMPLE_WIDTH = 2  # pcm_s16le 每个采样2字节
+
+# 上传编码格式: 编码器参数, 容器格式, 文件扩展名, MIME类型
+UPLOAD_CODECS = {
+    'wav': (['-c:a', 'pcm_s16le'], 'wav', '.wav', 'audio/wav'),
+    'flac': (['-c:a', 'flac', '-compression_level', '5'], 'flac', '.flac', 'audio/flac'),
+    'opus': (['-c:a', 'libopus', '-application', 'voip'], 'ogg', '.ogg', 'audio/ogg'),
+}
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+def get_ffmpeg_binary():
+    """获取ffmpeg可执行文件路径"""
+    binary = os.environ.get('FFMPEG_BINARY')
+    if binary:
+        return binary
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return 'ffmpeg'
+
+def probe_duration(media_path):
+    """通过ffmpeg读取媒体文件时长（秒），无法获取时返回None"""
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-hide_banner', '-i', media_path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    output = result.stderr.decode('utf-8', errors='replace')
+    match = re.search(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)', output)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def frame_size(channels=None):
+    """每个采样帧的字节数"""
+    channels = channels or config.AUDIO_CHANNELS
+    return SAMPLE_WIDTH * channels
+
+def seconds_to_bytes(seconds, sample_rate=None, channels=None):
+    """将时长换算为PCM字节数（按帧对齐）"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    return int(seconds * sample_rate) * frame_size(channels)
+
+def bytes_to_seconds(num_bytes, sample_rate=None, channels=None):
+    """将PCM字节数换算为时长"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    return num_bytes / float(sample_rate * frame_size(channels))
+
+def _pcm_command(media_path, output, sample_rate, channels, start=None, duration=None):
+    """生成将媒体文件（指定时间范围）解码为16位PCM的ffmpeg命令"""
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-v', 'error']
+    if start:
+        # 放在输入之前为快速定位，音频仍按采样精确截取
+        cmd += ['-ss', f'{start:.6f}']
+    cmd += ['-i', media_path]
+    if duration:
+        cmd += ['-t', f'{duration:.6f}']
+    cmd += ['-vn', '-sn', '-dn',
+            '-ac', str(channels),
+            '-ar', str(sample_rate),
+            '-acodec', 'pcm_s16le',
+            '-f', 's16le', '-y', output]
+    return cmd
+
+def stream_pcm(media_path, sample_rate=None, channels=None, block_seconds=None,
+               start=None, duration=None):
+    """通过ffmpeg管道只解码音频流，逐块产出16位PCM数据"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    if block_seconds is None:
+        block_seconds = settings.get('AUDIO_STREAM_BLOCK_SECONDS')
+    block_size = max(seconds_to_bytes(block_seconds, sample_rate, channels),
+                     frame_size(channels))
+
+    cmd = _pcm_command(media_path, 'pipe:1', sample_rate, channels, start, duration)
+
+    # 错误输出写入临时文件，避免管道写满导致ffmpeg阻塞
+    stderr_file = tempfile.TemporaryFile()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file,
+                               bufsize=block_size)
+    try:
+        while True:
+            data = process.stdout.read(block_size)
+            if not data:
+                break
+            yield data
+
+        process.wait()
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            message = stderr_file.read().decode('utf-8', errors='replace').strip()
+            raise Exception(f"ffmpeg解码失败: {message}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        stderr_file.close()
+
+def split_ranges(duration, parts, sample_rate=None):
+    """将时长均分为若干段，边界按采样对齐，返回[(起始秒数, 时长秒数)]"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    total = int(round(duration * sample_rate))
+    bounds = [total * i // parts for i in range(parts + 1)]
+    return [(bounds[i] / float(sample_rate), (bounds[i + 1] - bounds[i]) / float(sample_rate))
+            for i in range(parts)]
+
+def decode_segment(media_path, pcm_path, start, duration, expected_bytes=None,
+                   sample_rate=None, channels=None):
+    """解码一个时间段到原始PCM文件；指定expected_bytes时截断或补零到该长度，保证各段无缝拼接"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    cmd = _pcm_command(media_path, pcm_path, sample_rate, channels, start, duration)
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"ffmpeg解码失败: {message}")
+
+    if expected_bytes is not None:
+        size = os.path.getsize(pcm_path)
+        with open(pcm_path, 'r+b') as f:
+            if size > expected_bytes:
+                f.truncate(expected_bytes)
+            elif size < expected_bytes:
+                f.seek(0, os.SEEK_END)
+                f.write(b'\x00' * (expected_bytes - size))
+    return pcm_path
+
+def stream_pcm_parallel(media_path, workers=None, sample_rate=None, channels=None,
+                        block_seconds=None, duration=None):
+    """先读取时长，再由多个ffmpeg进程并行解码各时间段，按顺序逐块产出PCM数据"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    workers = workers or settings.get('AUDIO_EXTRACT_WORKERS') or os.cpu_count() or 1
+    min_segment = settings.get('AUDIO_PARALLEL_MIN_SECONDS')
+    if block_seconds is None:
+        block_seconds = settings.get('AUDIO_STREAM_BLOCK_SECONDS')
+    block_size = max(seconds_to_bytes(block_seconds, sample_rate, channels), frame_size(channels))
+
+    duration = duration or probe_duration(media_path)
+    parts = min(workers, int(duration // min_segment)) if duration else 1
+    if parts <= 1:
+        # 时长未知或较短时直接单进程解码
+        for block in stream_pcm(media_path, sample_rate, channels, block_seconds):
+            yield block
+        return
+
+    ranges = split_ranges(duration, parts, sample_rate)
+    temp_dir = tempfile.mkdtemp(prefix='segments_')
+    executor = ThreadPoolExecutor(max_workers=parts)
+    futures = []
+    try:
+        # 每个线程驱动一个ffmpeg进程，解码在各自的进程中并行进行
+        for index, (start, length) in enumerate(ranges):
+            last = index == len(ranges) - 1
+            expected = None if last else seconds_to_bytes(length, sample_rate, channels)
+            futures.append(executor.submit(
+                decode_segment, media_path, os.path.join(temp_dir, f'{index:04d}.pcm'),
+                start, None if last else length, expected, sample_rate, channels))
+
+        # 按顺序产出，后面的分段在前面的分段被消费时继续解码
+        for future in futures:
+            pcm_path = future.result()
+            with open(pcm_path, 'rb') as f:
+                while True:
+                    data = f.read(block_size)
+                    if not data:
+                        break
+                    yield data
+            os.unlink(pcm_path)
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def write_wav(pcm_blocks, wav_path, sample_rate=None, channels=None):
+    """将PCM数据块逐块写入WAV文件，返回写入的字节数"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    total = 0
+    with wave.open(wav_path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(sample_rate)
+        for block in pcm_blocks:
+            wav_file.writeframes(block)
+            total += len(block)
+    return total
+
+def read_wav_header(wav_path):
+    """解析WAV文件头，返回(格式信息, 数据块偏移, 数据块字节数)，不是WAV文件时抛出ValueError"""
+    with open(wav_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError(f"不是有效的WAV文件: {wav_path}")
+        riff, _, wave_id = struct.unpack('<4sI4s', header)
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"不是有效的WAV文件: {wav_path}")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV文件缺少数据块: {wav_path}")
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                data = f.read(size + (size & 1))
+                tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', data[:16])
+                # 扩展格式的实际编码在子格式GUID的前两个字节
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(data) >= 26:
+                    tag = struct.unpack('<H', data[24:26])[0]
+                fmt = {'format': tag, 'channels': channels, 'sample_rate': sample_rate, 'bits': bits}
+            elif chunk_id == b'data':
+                offset = f.tell()
+                break
+            else:
+                f.seek(size + (size & 1), os.SEEK_CUR)
+
+    if fmt is None:
+        raise ValueError(f"WAV文件缺少格式块: {wav_path}")
+    return fmt, offset, min(size, os.path.getsize(wav_path) - offset)
+
+def wav_duration(wav_path):
+    """按WAV文件头中的数据块大小与字节率计算时长（秒），不是WAV文件时抛出ValueError"""
+    fmt, _, size = read_wav_header(wav_path)
+    byte_rate = fmt['sample_rate'] * fmt['channels'] * (fmt['bits'] // 8)
+    if not byte_rate:
+        raise ValueError(f"WAV文件格式无效: {wav_path}")
+    return size / float(byte_rate)
+
+def is_audio_file(path):
+    """是否为纯音频文件（按扩展名判断）"""
+    extensions = settings.get('SUPPORTED_AUDIO_FORMATS')
+    return os.path.splitext(path)[1].lower() in extensions
+
+def is_pipeline_wav(path, sample_rate=None, channels=None):
+    """是否已是转写所需格式（16位PCM、目标采样率与声道数）的WAV文件，可直接使用无需转码"""
+    if os.path.splitext(path)[1].lower() != '.wav':
+        return False
+    try:
+        fmt, _, _ = read_wav_header(path)
+    except (OSError, ValueError, struct.error):
+        return False
+    return (fmt['format'] == WAVE_FORMAT_PCM and fmt['bits'] == SAMPLE_WIDTH * 8
+            and fmt['sample_rate'] == (sample_rate or config.AUDIO_SAMPLE_RATE)
+            and fmt['channels'] == (channels or config.AUDIO_CHANNELS))
+
+def iter_wav_pcm(wav_path, block_seconds=None):
+    """逐块读取WAV文件中的PCM数据"""
+    if block_seconds is None:
+        block_seconds = settings.get('AUDIO_STREAM_BLOCK_SECONDS')
+    with wave.open(wav_path, 'rb') as wav_file:
+        frames_per_block = max(int(block_seconds * wav_file.getframerate()), 1)
+        while True:
+            data = wav_file.readframes(frames_per_block)
+            if not data:
+                break
+            yield data
+
+def iter_windows(pcm_blocks, window_seconds, overlap_seconds=0,
+                 sample_rate=None, channels=None):
+    """将PCM数据流切分为带重叠的时间窗口，产出(起始秒数, PCM数据)"""
+    window_size = seconds_to_bytes(window_seconds, sample_rate, channels)
+    overlap_size = seconds_to_bytes(overlap_seconds, sample_rate, channels)
+    if overlap_size >= window_size:
+        raise ValueError("分块重叠时长必须小于分块时长")
+    step = window_size - overlap_size
+
+    buffer = bytearray()
+    offset = 0  # buffer起点在整段音频中的字节偏移
+    for block in pcm_blocks:
+        buffer.extend(block)
+        while len(buffer) >= window_size:
+            yield bytes_to_seconds(offset, sample_rate, channels), bytes(buffer[:window_size])
+            del buffer[:step]
+            offset += step
+
+    # 剩余数据不足一个窗口；若全部落在上一窗口的重叠区内则无需再发送
+    if len(buffer) > overlap_size or (offset == 0 and buffer):
+        yield bytes_to_seconds(offset, sample_rate, channels), bytes(buffer)
+
+def pcm_to_wav_bytes(pcm_data, sample_rate=None, channels=None):
+    """将PCM数据封装为内存中的WAV文件"""
+    output = io.BytesIO()
+    write_wav([pcm_data], output, sample_rate, channels)
+    return output.getvalue()
+
+def get_upload_codec(codec=None):
+    """获取上传编码格式，返回(编码名称, 文件扩展名, MIME类型)"""
+    codec = (codec or settings.get('UPLOAD_AUDIO_CODEC')).lower()
+    if codec not in UPLOAD_CODECS:
+        raise ValueError(f"不支持的上传编码格式: {codec}")
+    _, _, extension, mime_type = UPLOAD_CODECS[codec]
+    return codec, extension, mime_type
+
+def _encoder_args(codec, sample_rate, channels):
+    """构造ffmpeg编码参数"""
+    codec_args, container, _, _ = UPLOAD_CODECS[codec]
+    args = list(codec_args)
+    if codec == 'opus':
+        args += ['-b:a', settings.get('UPLOAD_OPUS_BITRATE')]
+    return args + ['-ac', str(channels), '-ar', str(sample_rate), '-f', container]
+
+def encode_pcm(pcm_data, codec=None, sample_rate=None, channels=None):
+    """将PCM数据编码为上传格式，返回(编码后数据, 文件扩展名, MIME类型)"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    codec, extension, mime_type = get_upload_codec(codec)
+    if codec == 'wav':
+        return pcm_to_wav_bytes(pcm_data, sample_rate, channels), extension, mime_type
+
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-v', 'error',
+           '-f', 's16le', '-ar', str(sample_rate), '-ac', str(channels), '-i', 'pipe:0']
+    cmd += _encoder_args(codec, sample_rate, channels) + ['pipe:1']
+    result = subprocess.run(cmd, input=pcm_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"音频编码失败: {message}")
+    return result.stdout, extension, mime_type
+
+def encode_audio_file(audio_path, codec=None, sample_rate=None, channels=None):
+    """将音频文件转码为上传格式，返回(文件路径, MIME类型)；WAV格式直接返回原文件"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    channels = channels or config.AUDIO_CHANNELS
+    codec, extension, mime_type = get_upload_codec(codec)
+    if codec == 'wav':
+        return audio_path, mime_type
+
+    temp_file = tempfile.NamedTemporaryFile(suffix=extension, delete=False)
+    temp_file.close()
+    cmd = [get_ffmpeg_binary(), '-nostdin', '-v', 'error', '-y', '-i', audio_path]
+    cmd += _encoder_args(codec, sample_rate, channels) + [temp_file.name]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        os.unlink(temp_file.name)
+        message = result.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"音频编码失败: {message}")
+    return temp_file.name, mime_type
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video2Script 批量处理（无界面）
+"""
+
+import sys
+import os
+import glob
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import settings
+import instrumentation
+from pipeline import VideoPipeline
+
+def collect_videos(inputs, recursive=False):
+    """收集目录、通配符或文件列表中支持格式的视频和音频文件"""
+    extensions = {ext.lower() for ext in config.SUPPORTED_VIDEO_FORMATS
+                  + settings.get('SUPPORTED_AUDIO_FORMATS')}
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = os.path.join(item, '**', '*') if recursive else os.path.join(item, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(item, recursive=recursive) or [item]
+        for path in sorted(candidates):
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in extensions:
+                found.append(os.path.abspath(path))
+
+    # 去重并保持顺序
+    seen = set()
+    return [path for path in found if not (path in seen or seen.add(path))]
+
+class BatchPipeline(VideoPipeline):
+    """批量处理流水线，保证输出文件名不冲突"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reserved = set()
+        self._name_lock = threading.Lock()
+
+    def output_filename(self, job):
+        """同名视频或已存在的输出文件时追加序号"""
+        base = os.path.splitext(super().output_filename(job))[0]
+        output_dir = self.document_processor.output_dir
+        with self._name_lock:
+            index = 1
+            filename = f"{base}.docx"
+            while filename in self._reserved or os.path.exists(os.path.join(output_dir, filename)):
+                index += 1
+                filename = f"{base}_{index}.docx"
+            self._reserved.add(filename)
+        return filename
+
+def print_summary(jobs, elapsed):
+    """输出吞吐量统计"""
+    succeeded = [job for job in jobs if job['error'] is None]
+    failed = [job for job in jobs if job['error'] is not None]
+    audio_minutes = sum(job['audio_seconds'] for job in succeeded) / 60.0
+    elapsed_minutes = max(elapsed, 1e-6) / 60.0
+
+    print("\n" + "=" * 50)
+    print(f"处理完成: 成功 {len(succeeded)} 个, 失败 {len(failed)} 个, 总耗时 {elapsed:.1f} 秒")
+    print(f"吞吐量: {len(succeeded) / (elapsed_minutes / 60.0):.1f} 视频/小时, "
+          f"{audio_minutes / elapsed_minutes:.2f} 音频分钟/分钟")
+    for job in failed:
+        print(f"  ✗ {job['video_path']}: {job['error']}")
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Video2Script 批量处理")
+    parser.add_argument('inputs', nargs='+', help="视频或音频文件、目录或通配符（如 videos/*.mp4）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="递归搜索子目录")
+    parser.add_argument('-t', '--template', help="Word文档模板")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认为配置中的OUTPUT_DIR")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="音频提取的进程数")
+    parser.add_argument('-k', '--keywords', help="章节关键词文件（JSON或每行一个关键词），与内置关键词合并")
+    parser.add_argument('--mock', action='store_true', help="使用模拟的语音识别与文本处理（无需API）")
+    parser.add_argument('--no-cache', action='store_true', help="不使用转写缓存和模型输出缓存")
+    parser.add_argument('--trace', help="导出JSON跟踪文件（进程池中的音频提取不计入）")
+    parser.add_argument('--metrics', help="导出Prometheus文本格式指标文件")
+    args = parser.parse_args(argv)
+
+    videos = collect_videos(args.inputs, args.recursive)
+    if not videos:
+        print("未找到支持格式的视频或音频文件: " + ", ".join(
+            config.SUPPORTED_VIDEO_FORMATS + settings.get('SUPPORTED_AUDIO_FORMATS')))
+        return 1
+
+    if args.output_dir:
+        config.OUTPUT_DIR = args.output_dir
+    if args.keywords:
+        config.SECTION_KEYWORDS_FILE = args.keywords
+    if args.no_cache:
+        config.TRANSCRIPTION_CACHE_ENABLED = False
+        config.LLM_CACHE_ENABLED = False
+    if args.trace:
+        config.TRACE_FILE = args.trace
+    if args.metrics:
+        config.METRICS_FILE = args.metrics
+
+    kwargs = {'template_path': args.template}
+    if args.mock:
+        from speech_to_text import MockSpeechToText
+        from text_processor import MockTextProcessor
+        from document_processor import MockDocumentProcessor
+        kwargs.update(speech_factory=MockSpeechToText, text_processor_factory=MockTextProcessor,
+                      document_processor=MockDocumentProcessor())
+
+    print(f"共 {len(videos)} 个视频, 音频提取进程数: {args.jobs}")
+    start = time.perf_counter()
+
+    def on_done(job):
+        name = os.path.basename(job['video_path'])
+        if job['error'] is None:
+            print(f"✓ {name} -> {job['output_path']}")
+        else:
+            print(f"✗ {name}: {job['error']}")
+
+    # CPU密集的音频提取交给进程池，API阶段在线程中并发
+    with ProcessPoolExecutor(max_workers=args.jobs) as extract_executor:
+        pipeline = BatchPipeline(extract_executor=None if args.mock else extract_executor, **kwargs)
+        pipeline.workers['extract'] = max(args.jobs, 1)
+        jobs = pipeline.run_sync(videos, on_done)
+
+    print_summary(jobs, time.perf_counter() - start)
+    if not args.mock:
+        from http_client import get_shared_client
+        rate_limiter = get_shared_client().rate_limiter
+        if rate_limiter is not None:
+            print(f"API限流: {rate_limiter.describe()}")
+    instrumentation.export_configured()
+    return 0 if all(job['error'] is None for job in jobs) else 2
+
+if __name__ == "__main__":
+    sys.exit(main())
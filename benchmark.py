@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video2Script 性能基准测试
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Windows下无resource模块，不记录内存峰值
+    resource = None
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import config
+import audio_utils
+
+# 端到端基准测试的媒体时长
+BENCHMARK_SIZES = {'1m': 60, '10m': 600, '1h': 3600, '3h': 10800}
+BENCHMARK_STAGES = ['extract', 'transcribe', 'optimize', 'structure', 'export']
+
+# 中文讲解语速约每秒4个字
+TRANSCRIPT_CHARS_PER_SECOND = 4
+
+def generate_speech_like_audio(wav_path, seconds, sample_rate=None, seed=0):
+    """生成类似语音的合成音频（带音节起伏和停顿的谐波信号）"""
+    sample_rate = sample_rate or config.AUDIO_SAMPLE_RATE
+    rng = np.random.default_rng(seed)
+    block_seconds = 10
+
+    def blocks():
+        phase = 0.0
+        for begin in range(0, int(seconds), block_seconds):
+            n = int(min(block_seconds, seconds - begin) * sample_rate)
+            t = np.arange(n) / sample_rate
+            # 基频在100~250Hz之间缓慢变化，叠加谐波
+            pitch = 150 + 60 * np.sin(2 * np.pi * 0.3 * (t + begin)) + rng.normal(0, 5)
+            phases = phase + 2 * np.pi * np.cumsum(pitch) / sample_rate
+            phase = phases[-1]
+            signal = sum(np.sin(k * phases) / k for k in range(1, 6))
+            # 约每秒4个音节的包络，并随机插入停顿
+            envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+            pauses = np.repeat(rng.random(int(np.ceil(n / sample_rate))) < 0.25, sample_rate)[:n]
+            envelope[pauses] = 0
+            noise = rng.normal(0, 0.01, n)
+            samples = (signal * envelope * 0.3 + noise) * 32767
+            yield np.clip(samples, -32768, 32767).astype('<i2').tobytes()
+
+    audio_utils.write_wav(blocks(), wav_path, sample_rate, 1)
+    return wav_path
+
+def generate_synthetic_video(video_path, seconds):
+    """生成带合成语音音轨的低分辨率视频"""
+    wav_path = os.path.splitext(video_path)[0] + '.wav'
+    generate_speech_like_audio(wav_path, seconds)
+    try:
+        cmd = [audio_utils.get_ffmpeg_binary(), '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+               '-f', 'lavfi', '-i', 'color=c=gray:s=320x240:r=1', '-i', wav_path,
+               '-map', '0:v', '-map', '1:a', '-c:v', 'mpeg4', '-c:a', 'aac', '-b:a', '64k',
+               '-shortest', video_path]
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            raise Exception(f"合成视频生成失败: {result.stderr.decode('utf-8', errors='replace')}")
+    finally:
+        os.unlink(wav_path)
+    return video_path
+
+def generate_transcript(seconds, chars_per_second=TRANSCRIPT_CHARS_PER_SECOND):
+    """生成与媒体时长相当的合成转写文本"""
+    from mock_server import MOCK_SENTENCES
+    target = int(seconds * chars_per_second)
+    parts = []
+    length = 0
+    index = 0
+    while length < target:
+        sentence = MOCK_SENTENCES[index % len(MOCK_SENTENCES)]
+        parts.append(sentence)
+        length += len(sentence)
+        index += 1
+    return ''.join(parts)
+
+def peak_rss_mb():
+    """返回本进程与子进程（ffmpeg等）的内存峰值（MB）"""
+    if resource is None:
+        return None, None
+    # Linux下单位为KB，macOS下为字节
+    scale = 1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+def run_pipeline_benchmark(video_path, seconds, api_base):
+    """在独立进程中运行一次完整流程，记录各阶段耗时与内存峰值"""
+    from speech_to_text import SpeechToText
+    from text_processor import TextProcessor
+    from document_processor import DocumentProcessor
+
+    output_dir = tempfile.mkdtemp()
+    config.DEEPSEEK_API_BASE = api_base
+    config.OUTPUT_DIR = output_dir
+    config.TRANSCRIPTION_CACHE_ENABLED = False
+    config.LLM_CACHE_ENABLED = False
+
+    stages = {}
+    rss = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        stages[name] = time.perf_counter() - start
+        rss[name] = peak_rss_mb()[0]
+        return result
+
+    try:
+        speech = SpeechToText()
+        processor = TextProcessor()
+        audio_path = timed('extract', speech.extract_audio_from_video, video_path)
+        raw_text = timed('transcribe', speech.transcribe_audio, audio_path)
+
+        # 文本阶段使用与时长相当的合成转写文本，结果不受模拟服务返回内容影响
+        transcript = generate_transcript(seconds)
+        optimized_text = timed('optimize', processor.optimize_text, transcript)
+        structured_content = timed('structure', processor.analyze_structure, optimized_text)
+        timed('export', DocumentProcessor().export_to_docx, structured_content, None, 'benchmark.docx')
+
+        own, children = peak_rss_mb()
+        return {
+            'audio_seconds': seconds,
+            'raw_text_chars': len(raw_text),
+            'transcript_chars': len(transcript),
+            'stages': stages,
+            'total_seconds': sum(stages.values()),
+            'stage_peak_rss_mb': rss,
+            'peak_rss_mb': own,
+            'children_peak_rss_mb': children
+        }
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+def compare_results(current, baseline, threshold=0.1):
+    """与基准结果比较，返回(比较行, 退化项)"""
+    rows = []
+    regressions = []
+    for size, result in current['results'].items():
+        previous = baseline.get('results', {}).get(size)
+        if previous is None:
+            continue
+        metrics = [(f"{stage}_seconds", result['stages'].get(stage), previous['stages'].get(stage))
+                   for stage in BENCHMARK_STAGES]
+        metrics.append(('total_seconds', result['total_seconds'], previous['total_seconds']))
+        metrics.append(('peak_rss_mb', result.get('peak_rss_mb'), previous.get('peak_rss_mb')))
+        for name, value, old in metrics:
+            if value is None or not old:
+                continue
+            change = (value - old) / old
+            rows.append((size, name, old, value, change))
+            if change > threshold:
+                regressions.append((size, name, old, value, change))
+    return rows, regressions
+
+def benchmark_pipeline(sizes, media_dir=None, output_path=None, baseline_path=None,
+                       threshold=0.1, latency='fixed:0.05'):
+    """端到端基准测试：生成合成视频，逐阶段计时并与基准结果比较"""
+    from mock_server import MockApiServer
+
+    # 合成视频生成较慢，保留在媒体目录中供下次复用
+    media_dir = media_dir or os.path.join(config.TEMP_DIR, 'benchmark')
+    os.makedirs(media_dir, exist_ok=True)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'latency': latency,
+        'results': {}
+    }
+
+    with MockApiServer(latency=latency) as server:
+        for size in sizes:
+            seconds = BENCHMARK_SIZES[size]
+            video_path = os.path.join(media_dir, f'synthetic_{size}.mp4')
+            if not os.path.exists(video_path):
+                print(f"正在生成 {size} 合成视频...")
+                generate_synthetic_video(video_path, seconds)
+
+            # 每种时长使用新进程，内存峰值互不影响
+            print(f"正在测试 {size}...")
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(run_pipeline_benchmark, video_path, seconds, server.url).result()
+            report['results'][size] = result
+
+            timings = ', '.join(f"{stage} {result['stages'][stage]:.2f}s" for stage in BENCHMARK_STAGES)
+            rss = f"{result['peak_rss_mb']:.0f} MB" if result['peak_rss_mb'] is not None else "未知"
+            print(f"  {timings}; 总计 {result['total_seconds']:.2f}s, 内存峰值 {rss}")
+
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到: {output_path}")
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare_results(report, baseline, threshold)
+        print(f"\n与基准 {baseline_path} 比较（退化阈值 {threshold:.0%}）:")
+        print(f"{'时长':<6}{'指标':<22}{'基准':>10}{'本次':>10}{'变化':>10}")
+        for size, name, old, value, change in rows:
+            mark = ' ✗' if change > threshold else ''
+            print(f"{size:<6}{name:<22}{old:>10.2f}{value:>10.2f}{change:>+10.1%}{mark}")
+
+    return report, regressions
+
+def parse_importtime(output):
+    """解析 -X importtime 的输出，按输出顺序返回 [(模块名, 自身耗时us, 累计耗时us, 层级)]"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+def direct_imports(entries, module):
+    """返回模块直接导入的子模块（子模块的输出位于父模块之前，层级加一）"""
+    for index in range(len(entries) - 1, -1, -1):
+        name, _, _, depth = entries[index]
+        if name == module:
+            break
+    else:
+        return []
+    children = []
+    for child in reversed(entries[:index]):
+        if child[3] <= depth:
+            break
+        if child[3] == depth + 1:
+            children.append(child)
+    return children
+
+def benchmark_startup(module='main', runs=5, budget_ms=300.0, top=10):
+    """用 python -X importtime 测量启动导入耗时，超出预算时返回False"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    totals = []
+    wall_times = []
+    entries = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                cwd=script_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        wall_times.append(time.perf_counter() - start)
+        output = result.stderr.decode('utf-8', errors='replace')
+        if result.returncode != 0:
+            raise Exception(f"导入 {module} 失败: {output[-500:]}")
+        entries = parse_importtime(output)
+        totals.append(next(e[2] for e in entries if e[0] == module and e[3] == 0) / 1000.0)
+
+    # 取中位数，排除首次运行编译字节码等干扰
+    total_ms = sorted(totals)[len(totals) // 2]
+    wall_ms = sorted(wall_times)[len(wall_times) // 2] * 1000
+    print(f"导入 {module}: {total_ms:.0f} ms（进程总耗时 {wall_ms:.0f} ms，{runs} 次取中位数），预算 {budget_ms:.0f} ms")
+
+    # 逐层列出最慢的导入，避免父子模块重复计时
+    print(f"{'模块':<40}{'累计(ms)':>10}")
+
+    def show(name, level):
+        children = sorted(direct_imports(entries, name), key=lambda e: e[2], reverse=True)[:top]
+        for child, _, cumulative, _ in children:
+            if cumulative >= 5000 or level == 0:
+                print(f"{'  ' * level + child:<40}{cumulative / 1000.0:>10.1f}")
+                if cumulative >= 20000:
+                    show(child, level + 1)
+    show(module, 0)
+
+    within_budget = total_ms <= budget_ms
+    print("✓ 启动耗时在预算内" if within_budget else "✗ 启动耗时超出预算")
+    return within_budget
+
+def legacy_segment_text(text, max_length):
+    """原分段实现（re.split后逐句拼接），作为分段基准测试的对照"""
+    import re
+    sentences = [s.strip() for s in re.split(r'[。！？]', text) if s.strip()]
+    segments = []
+    current_segment = ""
+    for sentence in sentences:
+        if len(current_segment) + len(sentence) < max_length:
+            current_segment += sentence + "。"
+        else:
+            if current_segment:
+                segments.append(current_segment.strip())
+            current_segment = sentence + "。"
+    if current_segment:
+        segments.append(current_segment.strip())
+    return segments
+
+def benchmark_segmenter(chars=500000, piece_size=1000, max_length=None):
+    """比较原分段实现与流式分段在长文本上的耗时，并检查分段长度不超过限制"""
+    from text_processor import segment_stream
+    max_length = max_length or config.MAX_TEXT_LENGTH
+    text = generate_transcript(chars / TRANSCRIPT_CHARS_PER_SECOND)[:chars]
+    # 语音识别结果常常缺少标点，同时测试整段没有句末标点的文本
+    unpunctuated = text.replace('。', '，')
+    pieces = [text[i:i + piece_size] for i in range(0, len(text), piece_size)]
+
+    cases = [
+        ('原实现', lambda: legacy_segment_text(text, max_length)),
+        ('流式分段（整段输入）', lambda: list(segment_stream([text], max_length))),
+        (f'流式分段（每{piece_size}字输入）', lambda: list(segment_stream(pieces, max_length))),
+        ('流式分段（逐字输入）', lambda: list(segment_stream(iter(text), max_length))),
+        ('原实现（无句号）', lambda: legacy_segment_text(unpunctuated, max_length)),
+        ('流式分段（无句号）', lambda: list(segment_stream([unpunctuated], max_length))),
+    ]
+
+    print(f"文本长度: {len(text)} 字, 分段上限: {max_length} 字")
+    print(f"{'方式':<24}{'耗时(ms)':>10}{'分段数':>8}{'最长分段':>10}")
+    results = []
+    within_limit = True
+    for name, run in cases:
+        start = time.perf_counter()
+        segments = run()
+        elapsed = time.perf_counter() - start
+        longest = max((len(segment) for segment in segments), default=0)
+        if not name.startswith('原实现'):
+            within_limit = within_limit and longest <= max_length
+        results.append({'name': name, 'seconds': elapsed, 'segments': len(segments), 'longest': longest})
+        print(f"{name:<24}{elapsed * 1000:>10.1f}{len(segments):>8}{longest:>10}")
+
+    print("✓ 分段长度均在上限内" if within_limit else "✗ 存在超过上限的分段")
+    return results, within_limit
+
+def benchmark_codecs(media_path=None, seconds=60, bandwidth_mbps=10.0, use_api=False):
+    """比较各上传编码格式的上传字节数与端到端耗时"""
+    temp_path = None
+    if not media_path:
+        temp_path = tempfile.NamedTemporaryFile(suffix='.wav', delete=False).name
+        media_path = generate_speech_like_audio(temp_path, seconds)
+
+    try:
+        start = time.perf_counter()
+        pcm_data = b''.join(audio_utils.stream_pcm(media_path))
+        decode_time = time.perf_counter() - start
+        duration = audio_utils.bytes_to_seconds(len(pcm_data))
+
+        stt = None
+        if use_api:
+            from speech_to_text import SpeechToText
+            stt = SpeechToText()
+
+        results = []
+        for codec in audio_utils.UPLOAD_CODECS:
+            start = time.perf_counter()
+            audio_data, extension, mime_type = audio_utils.encode_pcm(pcm_data, codec)
+            encode_time = time.perf_counter() - start
+
+            if stt:
+                # 实际调用转写接口，测量真实的上传与识别耗时
+                start = time.perf_counter()
+                stt._request_transcription(audio_data, 'benchmark' + extension, mime_type)
+                upload_time = time.perf_counter() - start
+            else:
+                # 按给定带宽估算上传耗时
+                upload_time = len(audio_data) * 8 / (bandwidth_mbps * 1e6)
+
+            results.append({
+                'codec': codec,
+                'bytes': len(audio_data),
+                'ratio': len(pcm_data) / float(len(audio_data)),
+                'encode_seconds': encode_time,
+                'upload_seconds': upload_time,
+                'total_seconds': decode_time + encode_time + upload_time
+            })
+
+        print(f"音频时长: {duration:.1f} 秒, 解码耗时: {decode_time:.2f} 秒")
+        print("上传耗时: " + ("实测API" if stt else f"按 {bandwidth_mbps} Mbps 估算"))
+        print(f"{'格式':<8}{'上传字节':>14}{'压缩比':>8}{'编码(s)':>10}{'上传(s)':>10}{'端到端(s)':>12}")
+        for r in results:
+            print(f"{r['codec']:<8}{r['bytes']:>14,}{r['ratio']:>8.1f}"
+                  f"{r['encode_seconds']:>10.2f}{r['upload_seconds']:>10.2f}{r['total_seconds']:>12.2f}")
+        return results
+
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Video2Script 性能基准测试")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    codecs_parser = subparsers.add_parser('codecs', help="比较上传编码格式")
+    codecs_parser.add_argument('media', nargs='?', help="测试用音视频文件，缺省时生成合成音频")
+    codecs_parser.add_argument('--seconds', type=float, default=60, help="合成音频时长（秒）")
+    codecs_parser.add_argument('--bandwidth', type=float, default=10.0, help="估算上传耗时使用的带宽（Mbps）")
+    codecs_parser.add_argument('--api', action='store_true', help="实际调用转写接口测量耗时")
+
+    pipeline_parser = subparsers.add_parser('pipeline', help="端到端各阶段耗时与内存峰值")
+    pipeline_parser.add_argument('--sizes', default='1m,10m',
+                                 help="媒体时长，逗号分隔，可选: " + ", ".join(BENCHMARK_SIZES))
+    pipeline_parser.add_argument('--media-dir', help="合成媒体目录（生成后复用）")
+    pipeline_parser.add_argument('-o', '--output', help="结果JSON文件")
+    pipeline_parser.add_argument('-b', '--baseline', help="用于比较的基准结果JSON文件")
+    pipeline_parser.add_argument('--threshold', type=float, default=0.1, help="判定为退化的增幅")
+    pipeline_parser.add_argument('--latency', default='fixed:0.05', help="模拟API服务的延迟分布")
+
+    startup_parser = subparsers.add_parser('startup', help="启动导入耗时（python -X importtime）")
+    startup_parser.add_argument('--module', default='main', help="测量导入耗时的模块")
+    startup_parser.add_argument('--runs', type=int, default=5, help="运行次数")
+    startup_parser.add_argument('--budget', type=float, default=300.0, help="导入耗时预算（毫秒）")
+
+    segment_parser = subparsers.add_parser('segment', help="长文本分段耗时")
+    segment_parser.add_argument('--chars', type=int, default=500000, help="合成文本长度（字）")
+    segment_parser.add_argument('--piece-size', type=int, default=1000, help="流式输入每段的字数")
+
+    args = parser.parse_args()
+    if args.command == 'codecs':
+        benchmark_codecs(args.media, args.seconds, args.bandwidth, args.api)
+    elif args.command == 'pipeline':
+        sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+        unknown = [size for size in sizes if size not in BENCHMARK_SIZES]
+        if unknown:
+            parser.error(f"不支持的时长: {', '.join(unknown)}")
+        _, regressions = benchmark_pipeline(sizes, args.media_dir, args.output, args.baseline,
+                                            args.threshold, args.latency)
+        return 1 if regressions else 0
+    elif args.command == 'startup':
+        return 0 if benchmark_startup(args.module, args.runs, args.budget) else 1
+    elif args.command == 'segment':
+        _, within_limit = benchmark_segmenter(args.chars, args.piece_size)
+        return 0 if within_limit else 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import config
+import settings
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def hash_file(path, block_size=HASH_BLOCK_SIZE):
+    """流式计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def make_key(*parts):
+    """由若干参数生成缓存键"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """基于磁盘的键值缓存，超出容量时按最近使用时间（LRU）淘汰；
+    文件修改时间为写入时间（用于过期判断），访问时间为最近使用时间"""
+    def __init__(self, cache_dir, max_bytes, ttl_seconds=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key):
+        """读取缓存，未命中返回None"""
+        path = self._path(key)
+        try:
+            written = os.stat(path).st_mtime
+            now = time.time()
+            if self.ttl_seconds is not None and now - written > self.ttl_seconds:
+                # 已过期的条目直接删除
+                os.unlink(path)
+                with self._lock:
+                    self.expirations += 1
+                raise OSError("缓存已过期")
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            # 只更新访问时间，作为LRU淘汰依据，写入时间保持不变
+            os.utime(path, (now, written))
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """写入缓存，写入后按容量淘汰旧条目"""
+        # 先写临时文件再替换，避免并发读取到不完整的内容
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        self.evict()
+
+    def _entries(self):
+        """列出缓存条目 [(最近使用时间, 大小, 路径)]"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """淘汰最久未使用的条目，直到总大小不超过容量"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            for _, _, path in self._entries():
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """返回缓存统计信息"""
+        entries = self._entries()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(entries),
+                'bytes': sum(size for _, size, _ in entries)
+            }
+
+class TranscriptionCache(DiskCache):
+    """转写结果缓存，以媒体文件内容和识别参数作为键"""
+    def __init__(self, cache_dir=None, max_bytes=None):
+        cache_dir = cache_dir or os.path.join(settings.get('CACHE_DIR'), 'transcripts')
+        if max_bytes is None:
+            max_bytes = settings.get('TRANSCRIPTION_CACHE_MAX_MB') * 1024 * 1024
+        super().__init__(cache_dir, max_bytes)
+
+    def key_for(self, media_path, content_hash=None):
+        """生成媒体文件的缓存键；已计算过文件内容哈希时直接传入，避免重复读取文件"""
+        return make_key(
+            content_hash or hash_file(media_path),
+            settings.get('TRANSCRIBE_MODEL'),
+            settings.get('TRANSCRIBE_LANGUAGE'),
+            config.AUDIO_SAMPLE_RATE
+        )
+
+class LLMCache(DiskCache):
+    """大模型响应缓存，以模型、提示词版本、请求参数和输入文本作为键"""
+    def __init__(self, cache_dir=None, max_bytes=None, ttl_seconds=None):
+        cache_dir = cache_dir or os.path.join(settings.get('CACHE_DIR'), 'llm')
+        if max_bytes is None:
+            max_bytes = settings.get('LLM_CACHE_MAX_MB') * 1024 * 1024
+        if ttl_seconds is None:
+            ttl_days = settings.get('LLM_CACHE_TTL_DAYS')
+            ttl_seconds = ttl_days * 86400 if ttl_days else None
+        super().__init__(cache_dir, max_bytes, ttl_seconds)
+
+    def key_for(self, model, prompt_version, params, text):
+        """生成一次请求的缓存键"""
+        return make_key(model, prompt_version, params, text)
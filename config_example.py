@@ -6,6 +6,26 @@
 DEEPSEEK_API_KEY = "your_deepseek_api_key_here"  # 请替换为您的实际API密钥
 DEEPSEEK_API_BASE = "https://api.deepseek.com"
 
+# HTTP连接设置（所有API调用共享同一个连接池）
+HTTP_POOL_SIZE = 0           # 连接池大小，至少为 RATE_LIMIT_MAX_CONCURRENCY × 接口数（2），0表示按此自动确定
+HTTP_CONNECT_TIMEOUT = 10    # 连接超时（秒）
+HTTP_READ_TIMEOUT = 300      # 读取超时（秒）
+HTTP_MAX_RETRIES = 4         # 429、5xx及网络错误时的最大重试次数
+HTTP_BACKOFF_BASE = 1.0      # 指数退避的基础等待时间（秒）
+HTTP_BACKOFF_MAX = 30.0      # 单次重试的最长等待时间（秒）
+
+# API限流调度（语音识别与文本优化共用）
+RATE_LIMIT_ENABLED = True       # 是否启用限流调度
+RATE_LIMIT_RPM = 0              # 每分钟请求数上限，0表示不限
+RATE_LIMIT_TPM = 0              # 每分钟token数上限（按估计值预约，按响应中的用量修正），0表示不限
+RATE_LIMIT_BURST_SECONDS = 10   # 令牌桶最多积累的用量（秒）
+RATE_LIMIT_CONCURRENCY = 4      # 每个接口的初始并发上限
+RATE_LIMIT_MIN_CONCURRENCY = 1  # 并发上限的下限
+RATE_LIMIT_MAX_CONCURRENCY = 16 # 并发上限的上限（请求成功时逐步增加）
+RATE_LIMIT_DECREASE = 0.5       # 遇到429或耗时突增时并发上限乘以此系数
+RATE_LIMIT_LATENCY_SPIKE = 3.0  # 请求耗时超过平均耗时的倍数时视为拥塞
+RATE_LIMIT_PAUSE = 1.0          # 429响应未给出Retry-After时全部请求暂停的时间（秒）
+
 # 应用设置
 APP_TITLE = "Video2Script - 视频转脚本工具"
 APP_VERSION = "1.0.0"
@@ -14,6 +34,7 @@ WINDOW_HEIGHT = 800
 
 # 支持的文件格式
 SUPPORTED_VIDEO_FORMATS = ['.mp4', '.mov', '.avi', '.mkv']
+SUPPORTED_AUDIO_FORMATS = ['.wav', '.mp3', '.m4a', '.aac', '.flac', '.ogg']  # 音频文件直接转写，跳过视频解码
 SUPPORTED_TEMPLATE_FORMATS = ['.docx', '.doc']
 
 # 默认模板设置
@@ -27,6 +48,9 @@ DEFAULT_TEMPLATE = {
     ]
 }
 
+# 章节关键词文件（JSON列表或每行一个关键词的文本文件），与内置关键词及模板章节合并，None表示不使用
+SECTION_KEYWORDS_FILE = None
+
 # 输出设置
 OUTPUT_DIR = "output"
 TEMP_DIR = "temp"
@@ -35,9 +59,70 @@ TEMP_DIR = "temp"
 AUDIO_SAMPLE_RATE = 16000
 AUDIO_CHANNELS = 1
 
+# 音频提取设置
+AUDIO_EXTRACT_MODE = "stream"   # stream: 通过ffmpeg管道只解码音频流; parallel: 按时间段多进程并行解码; moviepy: 使用VideoFileClip提取
+AUDIO_EXTRACT_WORKERS = 0       # 并行解码的进程数，0表示使用CPU核心数
+AUDIO_PARALLEL_MIN_SECONDS = 60 # 并行解码时每段的最短时长（秒），较短的文件不拆分
+AUDIO_STREAM_BLOCK_SECONDS = 1  # 流式提取时每个PCM数据块的时长（秒）
+
+# 语音识别模型设置
+TRANSCRIBE_MODEL = "deepseek-whisper"
+TRANSCRIBE_LANGUAGE = "zh"
+
+# 上传音频编码设置
+UPLOAD_AUDIO_CODEC = "flac"     # wav: 未压缩; flac: 无损压缩; opus: 低码率语音压缩
+UPLOAD_OPUS_BITRATE = "24k"     # opus编码码率
+
+# 分块转写设置
+TRANSCRIBE_CHUNK_SECONDS = 120          # 每个转写分块的时长（秒），0表示整段音频一次上传
+TRANSCRIBE_CHUNK_OVERLAP_SECONDS = 2    # 相邻分块的重叠时长（秒）
+TRANSCRIBE_WORKERS = 4                  # 并发转写的最大线程数
+
+# 语音活动检测（VAD）设置，只上传有声部分
+# 启用时需先将完整音频写出为WAV文件再检测；关闭且AUDIO_EXTRACT_MODE为stream/parallel时边解码边转写，不写出音频文件
+VAD_ENABLED = True
+VAD_FRAME_MS = 30           # 能量计算的帧长（毫秒）
+VAD_THRESHOLD_DB = 12       # 高于噪声底多少dB视为语音
+VAD_MIN_ENERGY_DB = -50     # 语音能量的绝对下限（dBFS）
+VAD_MIN_SPEECH_MS = 250     # 短于此时长的语音片段将被丢弃
+VAD_MIN_SILENCE_MS = 800    # 短于此时长的静音不切分
+VAD_PADDING_MS = 200        # 语音片段前后保留的时长
+VAD_JOIN_GAP_MS = 300       # 同一分块内相邻语音片段之间插入的静音时长
+
+# 多视频流水线设置（各阶段并发数及阶段间队列长度）
+PIPELINE_EXTRACT_WORKERS = 2
+PIPELINE_TRANSCRIBE_WORKERS = 2
+PIPELINE_PROCESS_WORKERS = 2
+PIPELINE_EXPORT_WORKERS = 1
+PIPELINE_QUEUE_SIZE = 2
+
+# 缓存设置
+CACHE_DIR = "cache"
+TRANSCRIPTION_CACHE_ENABLED = True  # 相同视频再次处理时直接使用缓存的转写结果
+TRANSCRIPTION_CACHE_MAX_MB = 200    # 转写缓存的最大容量（MB），超出时淘汰最久未使用的条目
+LLM_CACHE_ENABLED = True            # 相同文本分块再次优化时直接使用缓存的模型输出
+LLM_CACHE_MAX_MB = 100              # 模型输出缓存的最大容量（MB）
+LLM_CACHE_TTL_DAYS = 30             # 模型输出缓存的有效期（天），0表示不过期
+
+# 任务检查点设置（中断后重新处理同一视频时从上次完成的阶段继续）
+JOBS_ENABLED = True
+JOB_DIR = "temp/jobs"
+JOB_KEEP_AUDIO = False   # 转写完成后是否保留任务目录中的音频文件
+
+# 跟踪与指标设置（各阶段耗时、输入输出字节数、API延迟与重试次数）
+TRACING_ENABLED = True
+TRACE_FILE = None       # JSON跟踪文件路径（Chrome跟踪格式），如 "output/trace.json"
+METRICS_FILE = None     # Prometheus文本格式指标文件路径，如 "/var/lib/node_exporter/video2script.prom"
+TRACE_MAX_SPANS = 10000 # 内存中保留的最大区间数
+
 # 文本处理设置
-MAX_TEXT_LENGTH = 4000  # 单次处理的文本长度限制
-CHUNK_OVERLAP = 200     # 文本分块重叠长度
+MAX_TEXT_LENGTH = 4000  # 单次处理的文本长度限制（结构分析按此长度分段；OPTIMIZE_CHUNK_TOKENS为0时文本优化也按此长度分块）
+CHUNK_OVERLAP = 200     # 文本分块重叠长度（前一块末尾的句子作为上文提供给下一块）
+OPTIMIZE_WORKERS = 4    # 文本优化的并发请求数
+OPTIMIZE_STREAM = True  # 界面中以流式方式请求文本优化，边生成边显示
+OPTIMIZE_MAX_TOKENS = 8000   # 文本优化单次请求的最大输出token数（deepseek-chat上限为8192）
+OPTIMIZE_CHUNK_TOKENS = 6000 # 文本优化每块原文的估计token数上限，优化结果与原文长度相近，需低于OPTIMIZE_MAX_TOKENS留出余量；0表示按MAX_TEXT_LENGTH字数分块
+TOKEN_ESTIMATE_SCALE = 1.0   # token估计值的校正系数（中文约每字0.6个token，英文约每字符0.3个token）
 
 # 使用说明:
 # 1. 将此文件复制为 config.py
@@ -1,11 +1,8 @@
 import os
 import json
 from datetime import datetime
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.enum.style import WD_STYLE_TYPE
 import config
+import instrumentation
 
 class DocumentProcessor:
     def __init__(self):
@@ -19,6 +16,8 @@ class DocumentProcessor:
     
     def load_template(self, template_path):
         """加载Word文档模板"""
+        # python-docx在首次生成文档时才导入，加快程序启动
+        from docx import Document
         try:
             if os.path.exists(template_path):
                 doc = Document(template_path)
@@ -31,6 +30,10 @@ class DocumentProcessor:
     
     def create_default_template(self):
         """创建默认模板"""
+        from docx import Document
+        from docx.shared import Inches
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        
         doc = Document()
         
         # 设置页面边距
@@ -56,6 +59,8 @@ class DocumentProcessor:
     
     def apply_template_structure(self, doc, structured_content):
         """将结构化内容应用到文档模板"""
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        
         # 清空现有内容（保留标题）
         for i in range(len(doc.paragraphs) - 1, 0, -1):
             p = doc.paragraphs[i]
@@ -85,6 +90,8 @@ class DocumentProcessor:
         
         return doc
     
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.json_size(args['structured_content']),
+                            bytes_out=instrumentation.file_size)
     def export_to_docx(self, structured_content, template_path=None, output_filename=None):
         """导出为Word文档"""
         try:
@@ -164,6 +171,8 @@ class MockDocumentProcessor:
             output_path = os.path.join(self.output_dir, output_filename)
             
             # 模拟创建文档
+            from docx import Document
+            from docx.enum.text import WD_ALIGN_PARAGRAPH
             doc = Document()
             title = doc.add_heading(structured_content['title'], 0)
             title.alignment = WD_ALIGN_PARAGRAPH.CENTER
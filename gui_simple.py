@@ -3,9 +3,12 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 import config
+import settings
 from speech_to_text import MockSpeechToText
 from text_processor import MockTextProcessor
 from document_processor import MockDocumentProcessor
+from job_store import JobStore
+import instrumentation
 
 class Video2ScriptGUI:
     def __init__(self, root):
@@ -18,6 +21,10 @@ class Video2ScriptGUI:
         self.text_processor = MockTextProcessor()
         self.document_processor = MockDocumentProcessor()
         
+        # 任务检查点，处理中断后可从上次完成的阶段继续
+        self.job_store = JobStore() if settings.get('JOBS_ENABLED') else None
+        self.job = None
+        
         # 文件路径
         self.video_path = None
         self.template_path = None
@@ -92,6 +99,10 @@ class Video2ScriptGUI:
                                         command=self.start_processing)
         self.process_button.pack(side=tk.LEFT, padx=5)
         
+        self.reprocess_button = ttk.Button(processing_frame, text="按修改重新处理",
+                                          command=self.start_reprocessing, state="disabled")
+        self.reprocess_button.pack(side=tk.LEFT, padx=5)
+        
         self.progress = ttk.Progressbar(processing_frame, mode='indeterminate')
         self.progress.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
     
@@ -149,7 +160,9 @@ class Video2ScriptGUI:
     def select_video(self):
         """选择视频文件"""
         filetypes = [
+            ("视频或音频文件", "*.mp4 *.mov *.avi *.mkv *.wav *.mp3 *.m4a *.aac *.flac *.ogg"),
             ("视频文件", "*.mp4 *.mov *.avi *.mkv"),
+            ("音频文件", "*.wav *.mp3 *.m4a *.aac *.flac *.ogg"),
             ("MP4文件", "*.mp4"),
             ("MOV文件", "*.mov"),
             ("所有文件", "*.*")
@@ -192,7 +205,9 @@ class Video2ScriptGUI:
         
         # 禁用按钮
         self.process_button.config(state="disabled")
-        self.progress.start()
+        self.reprocess_button.config(state="disabled")
+        self.progress.config(mode='determinate', maximum=100, value=0)
+        self.raw_text.delete(1.0, tk.END)
         self.status_var.set("正在处理视频...")
         
         # 在新线程中处理
@@ -203,32 +218,27 @@ class Video2ScriptGUI:
     def process_video_thread(self):
         """在新线程中处理视频"""
         try:
-            # 语音转文字
+            job = self.job_store.open_job(self.video_path) if self.job_store is not None else None
+            self.job = job
+            
+            # 语音转文字，识别出的文字按分块陆续显示
             self.status_var.set("正在提取音频...")
-            raw_text = self.speech_to_text.process_video(self.video_path)
+            raw_text = self.speech_to_text.process_video(
+                self.video_path, job, progress_callback=self.on_transcript_progress)
             
             # 更新原始文本
             self.root.after(0, lambda: self.raw_text.delete(1.0, tk.END))
             self.root.after(0, lambda: self.raw_text.insert(1.0, raw_text))
             
             # 文本处理
-            self.status_var.set("正在优化文本...")
-            self.structured_content = self.text_processor.process_text(raw_text)
-            
-            # 更新优化文本
-            optimized_text = self.format_structured_content(self.structured_content)
+            # 经由主线程更新状态，保证排在语音识别进度之后
+            self.root.after(0, self.start_indeterminate_progress)
+            self.root.after(0, lambda: self.status_var.set("正在优化文本..."))
             self.root.after(0, lambda: self.optimized_text.delete(1.0, tk.END))
-            self.root.after(0, lambda: self.optimized_text.insert(1.0, optimized_text))
-            
-            # 更新结构化文本
-            structured_text = self.format_structured_content_detailed(self.structured_content)
-            self.root.after(0, lambda: self.structured_text.delete(1.0, tk.END))
-            self.root.after(0, lambda: self.structured_text.insert(1.0, structured_text))
-            
-            # 启用导出按钮
-            self.root.after(0, lambda: self.export_button.config(state="normal"))
-            self.root.after(0, lambda: self.save_content_button.config(state="normal"))
+            self.structured_content = self.text_processor.process_text(
+                raw_text, job, on_delta=self.on_optimize_progress)
             
+            self.show_structured_content()
             self.root.after(0, lambda: self.status_var.set("处理完成"))
             
         except Exception as e:
@@ -239,6 +249,87 @@ class Video2ScriptGUI:
             # 恢复按钮状态
             self.root.after(0, lambda: self.process_button.config(state="normal"))
             self.root.after(0, lambda: self.progress.stop())
+            
+            # 按配置导出跟踪与指标文件
+            try:
+                instrumentation.export_configured()
+            except Exception as e:
+                print(f"导出跟踪数据失败: {str(e)}")
+    
+    def start_reprocessing(self):
+        """按原始文本标签页中修改后的内容重新处理"""
+        raw_text = self.raw_text.get(1.0, tk.END).strip()
+        if not raw_text:
+            messagebox.showerror("错误", "原始文本为空")
+            return
+        
+        self.process_button.config(state="disabled")
+        self.reprocess_button.config(state="disabled")
+        self.start_indeterminate_progress()
+        self.status_var.set("正在重新处理修改的内容...")
+        
+        thread = threading.Thread(target=self.reprocess_text_thread, args=(raw_text,))
+        thread.daemon = True
+        thread.start()
+    
+    def reprocess_text_thread(self, raw_text):
+        """在新线程中增量重新处理：只重新优化和分析有修改的部分"""
+        try:
+            self.structured_content = self.text_processor.reprocess_text(raw_text)
+            self.show_structured_content()
+            self.root.after(0, lambda: self.status_var.set("重新处理完成"))
+            
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("错误", f"重新处理失败: {str(e)}"))
+            self.root.after(0, lambda: self.status_var.set("重新处理失败"))
+        
+        finally:
+            self.root.after(0, lambda: self.process_button.config(state="normal"))
+            self.root.after(0, lambda: self.progress.stop())
+    
+    def show_structured_content(self):
+        """更新优化文本与结构化内容标签页，并启用导出和重新处理按钮（在处理线程中调用）"""
+        # 更新优化文本
+        optimized_text = self.format_structured_content(self.structured_content)
+        self.root.after(0, lambda: self.optimized_text.delete(1.0, tk.END))
+        self.root.after(0, lambda: self.optimized_text.insert(1.0, optimized_text))
+        
+        # 更新结构化文本
+        structured_text = self.format_structured_content_detailed(self.structured_content)
+        self.root.after(0, lambda: self.structured_text.delete(1.0, tk.END))
+        self.root.after(0, lambda: self.structured_text.insert(1.0, structured_text))
+        
+        # 启用导出按钮
+        self.root.after(0, lambda: self.export_button.config(state="normal"))
+        self.root.after(0, lambda: self.save_content_button.config(state="normal"))
+        self.root.after(0, lambda: self.reprocess_button.config(state="normal"))
+    
+    def on_transcript_progress(self, text, processed_seconds, total_seconds):
+        """语音识别进度回调（在处理线程中调用）"""
+        percent = processed_seconds * 100.0 / total_seconds if total_seconds else 0
+        self.root.after(0, lambda: self.append_transcript(text, percent))
+    
+    def append_transcript(self, text, percent):
+        """追加识别出的文字并更新进度条"""
+        if text:
+            self.raw_text.insert(tk.END, text)
+            self.raw_text.see(tk.END)
+        self.progress.config(value=percent)
+        self.status_var.set(f"正在进行语音识别... {percent:.0f}%")
+    
+    def on_optimize_progress(self, delta):
+        """文本优化流式输出回调（在处理线程中调用）"""
+        self.root.after(0, lambda: self.append_optimized(delta))
+    
+    def append_optimized(self, delta):
+        """追加生成的优化文字"""
+        self.optimized_text.insert(tk.END, delta)
+        self.optimized_text.see(tk.END)
+    
+    def start_indeterminate_progress(self):
+        """文本处理阶段无法估计进度，切换为不确定模式"""
+        self.progress.config(mode='indeterminate')
+        self.progress.start()
     
     def format_structured_content(self, content):
         """格式化结构化内容为文本"""
@@ -285,6 +376,10 @@ class Video2ScriptGUI:
             )
             
             if output_path:
+                # 文档已导出，删除任务检查点
+                if self.job is not None:
+                    self.job_store.remove_job(self.job)
+                    self.job = None
                 messagebox.showinfo("成功", f"脚本已导出到:\n{output_path}")
                 self.status_var.set("导出完成")
             else:
@@ -0,0 +1,206 @@
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import config
+import settings
+import instrumentation
+from rate_limiter import RateLimiter
+from token_estimator import estimate_tokens
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# 经共享客户端访问的接口数（语音识别与对话），各接口的并发上限分别计算
+API_ENDPOINT_COUNT = 2
+
+def estimate_request_tokens(payload):
+    """估计对话请求消耗的token数（提示词加上不超过max_tokens、与提示词相当的输出），其他请求为0"""
+    if not isinstance(payload, dict) or not payload.get('messages'):
+        return 0
+    prompt = sum(estimate_tokens(message.get('content') or '') for message in payload['messages'])
+    return prompt + min(payload.get('max_tokens') or prompt, prompt)
+
+class ApiClient:
+    """DeepSeek API共享客户端：连接池复用、超时控制和带抖动的指数退避重试"""
+    def __init__(self, api_base=None, api_key=None):
+        self.api_base = (api_base or config.DEEPSEEK_API_BASE).rstrip('/')
+        self.api_key = api_key or config.DEEPSEEK_API_KEY
+        self.timeout = (settings.get('HTTP_CONNECT_TIMEOUT'),
+                        settings.get('HTTP_READ_TIMEOUT'))
+        self.max_retries = settings.get('HTTP_MAX_RETRIES')
+        self.backoff_base = settings.get('HTTP_BACKOFF_BASE')
+        self.backoff_max = settings.get('HTTP_BACKOFF_MAX')
+
+        # 保持长连接的连接池，各线程共享；不小于限流允许的最大并发数，避免连接用完即弃
+        pool_size = max(settings.get('HTTP_POOL_SIZE') or 0,
+                        settings.get('RATE_LIMIT_MAX_CONCURRENCY') * API_ENDPOINT_COUNT)
+        self.adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers['Authorization'] = f'Bearer {self.api_key}'
+
+        # 语音识别与对话接口共用的限流调度，共享客户端时全进程共用
+        self.rate_limiter = RateLimiter() if settings.get('RATE_LIMIT_ENABLED') else None
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0,
+            'status_429': 0,
+            'status_5xx': 0,
+            'timeouts': 0,
+            'connection_errors': 0
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._metrics[name] += value
+
+    def _backoff(self, attempt, response=None):
+        """计算重试等待时间：全抖动指数退避，并遵守Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except (TypeError, ValueError):
+                pass
+        return delay
+
+    def _record(self, path, latency, response, retry, data):
+        """记录请求耗时与收发字节数（流式响应不读取内容，按Content-Length计）"""
+        bytes_sent = len(data) if hasattr(data, '__len__') else 0
+        bytes_received = 0
+        status = None
+        if response is not None:
+            status = response.status_code
+            bytes_sent = int(response.request.headers.get('Content-Length') or bytes_sent)
+            bytes_received = int(response.headers.get('Content-Length') or 0)
+        instrumentation.record_api_call(path, latency, status, retry, bytes_sent, bytes_received)
+
+    def _release(self, permit, response, stream=False, timeout=False):
+        """归还限流许可；流式响应在关闭时归还，使并发数包含仍在生成的请求"""
+        if permit is None:
+            return
+        if response is None:
+            self.rate_limiter.release(permit, timeout=timeout)
+            return
+        
+        status = response.status_code
+        retry_after = None
+        try:
+            retry_after = float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            pass
+        
+        if status == 200 and stream:
+            limiter = self.rate_limiter
+            close = response.close
+            released = []
+            # 生成时间随输出长度变化，拥塞判断只看首字节耗时
+            first_byte = time.monotonic() - permit['start']
+
+            def close_and_release():
+                if not released:
+                    released.append(True)
+                    limiter.release(permit, status, latency=first_byte, streamed=True)
+                close()
+            response.close = close_and_release
+            return
+        
+        tokens_used = None
+        if status == 200 and permit['tokens']:
+            try:
+                tokens_used = response.json()['usage']['total_tokens']
+            except (ValueError, KeyError, TypeError):
+                pass
+        self.rate_limiter.release(permit, status, tokens_used, retry_after)
+
+    def post(self, path, tokens=None, **kwargs):
+        """发送POST请求，遇到429、5xx及网络错误时自动重试；
+        tokens为本次请求预计消耗的token数，缺省时按请求内容估计"""
+        url = self.api_base + path
+        kwargs.setdefault('timeout', self.timeout)
+        data = kwargs.get('data')
+        if tokens is None:
+            tokens = estimate_request_tokens(kwargs.get('json'))
+
+        for attempt in range(self.max_retries + 1):
+            # 流式请求体在重试前需要回到开头
+            if attempt > 0 and hasattr(data, 'seek'):
+                data.seek(0)
+
+            response = None
+            error = None
+            permit = None
+            if self.rate_limiter is not None:
+                # 耗时按请求规模折算：对话请求按token数，上传请求按字节数
+                size = tokens or (len(data) if hasattr(data, '__len__') else 0)
+                permit = self.rate_limiter.acquire(path, tokens, size)
+            self._count('requests')
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, **kwargs)
+            except requests.Timeout as e:
+                self._count('timeouts')
+                error = e
+            except requests.ConnectionError as e:
+                self._count('connection_errors')
+                error = e
+            except Exception:
+                self._release(permit, None)
+                raise
+            self._record(path, time.perf_counter() - start, response, attempt > 0, data)
+            self._release(permit, response, kwargs.get('stream', False), isinstance(error, requests.Timeout))
+
+            if response is not None:
+                if response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                self._count('status_429' if response.status_code == 429 else 'status_5xx')
+
+            if attempt == self.max_retries:
+                self._count('failures')
+                if response is not None:
+                    return response
+                raise error
+
+            delay = self._backoff(attempt, response)
+            if response is not None:
+                response.close()
+            self._count('retries')
+            time.sleep(delay)
+
+    def get_metrics(self):
+        """返回请求统计与连接复用情况"""
+        connections = 0
+        pooled_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pooled_requests += pool.num_requests
+
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['connections_opened'] = connections
+        metrics['connections_reused'] = max(pooled_requests - connections, 0)
+        if self.rate_limiter is not None:
+            metrics['rate_limits'] = self.rate_limiter.snapshot()
+        return metrics
+
+    def close(self):
+        self.session.close()
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def get_shared_client():
+    """获取进程内共享的API客户端"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = ApiClient()
+        return _shared_client
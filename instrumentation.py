@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import bisect
+import inspect
+import tempfile
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager
+import settings
+
+# API请求耗时直方图的分桶上限（秒）
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+def file_size(path):
+    """文件大小（字节），文件不存在时为0"""
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+def text_size(text):
+    """文本的UTF-8字节数"""
+    return len(text.encode('utf-8')) if text else 0
+
+def json_size(obj):
+    """对象序列化为JSON后的字节数"""
+    return len(json.dumps(obj, ensure_ascii=False).encode('utf-8'))
+
+class Span:
+    """一次计时区间，记录输入输出字节数与期间的API调用"""
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self.thread_id = threading.get_ident()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        with self._lock:
+            self.attributes[key] = value
+
+    def add(self, key, value=1):
+        with self._lock:
+            self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def finish(self, error=None):
+        self.duration = time.perf_counter() - self._started
+        self.error = error
+
+    def to_dict(self):
+        with self._lock:
+            attributes = dict(self.attributes)
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent is not None else None,
+            'start': self.start,
+            'duration': self.duration,
+            'thread': self.thread_id,
+            'error': self.error,
+            'attributes': attributes
+        }
+
+class Tracer:
+    """收集各阶段的计时区间与API调用指标，可导出为JSON跟踪文件和Prometheus文本格式"""
+    def __init__(self, max_spans=None):
+        self.enabled = settings.get('TRACING_ENABLED')
+        self.max_spans = max_spans or settings.get('TRACE_MAX_SPANS')
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.stages = {}
+            self.api = {}
+
+    def start_span(self, name, **attributes):
+        return Span(name, _current_span.get(), attributes)
+
+    def end_span(self, span, error=None):
+        span.finish(error)
+        with self._lock:
+            # 只保留最近的区间，长时间运行时内存不持续增长
+            self.spans.append(span)
+            if len(self.spans) > self.max_spans:
+                del self.spans[:len(self.spans) - self.max_spans]
+
+            stage = self.stages.setdefault(span.name, {
+                'count': 0, 'errors': 0, 'seconds': 0.0, 'bytes_in': 0, 'bytes_out': 0})
+            stage['count'] += 1
+            stage['seconds'] += span.duration
+            stage['bytes_in'] += span.attributes.get('bytes_in', 0)
+            stage['bytes_out'] += span.attributes.get('bytes_out', 0)
+            if error is not None:
+                stage['errors'] += 1
+
+    def record_api_call(self, path, latency, status=None, retry=False, bytes_sent=0, bytes_received=0):
+        """记录一次API请求，并计入当前区间及其上级区间"""
+        if not self.enabled:
+            return
+        with self._lock:
+            api = self.api.setdefault(path, {
+                'requests': 0, 'retries': 0, 'errors': 0, 'latency_seconds': 0.0,
+                'bytes_sent': 0, 'bytes_received': 0, 'status': {},
+                'buckets': [0] * (len(LATENCY_BUCKETS) + 1)})
+            api['requests'] += 1
+            api['retries'] += 1 if retry else 0
+            api['latency_seconds'] += latency
+            api['bytes_sent'] += bytes_sent
+            api['bytes_received'] += bytes_received
+            api['buckets'][bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            code = str(status) if status is not None else 'error'
+            api['status'][code] = api['status'].get(code, 0) + 1
+            if status is None or status >= 400:
+                api['errors'] += 1
+
+        span = _current_span.get()
+        while span is not None:
+            span.add('api_calls')
+            span.add('api_latency_seconds', latency)
+            span.add('api_bytes_sent', bytes_sent)
+            span.add('api_bytes_received', bytes_received)
+            if retry:
+                span.add('api_retries')
+            span = span.parent
+
+    def export_json(self, path):
+        """导出为Chrome跟踪格式（可在chrome://tracing或Perfetto中查看）"""
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            args = dict(span['attributes'])
+            if span['error'] is not None:
+                args['error'] = span['error']
+            events.append({
+                'name': span['name'],
+                'cat': 'video2script',
+                'ph': 'X',
+                'ts': span['start'] * 1e6,
+                'dur': span['duration'] * 1e6,
+                'pid': pid,
+                'tid': span['thread'],
+                'args': args
+            })
+        _write_atomic(path, json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'},
+                                       ensure_ascii=False, indent=2))
+        return path
+
+    def prometheus_text(self):
+        """生成Prometheus文本格式的指标"""
+        with self._lock:
+            stages = json.loads(json.dumps(self.stages))
+            api = json.loads(json.dumps(self.api))
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{val}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric('video2script_stage_seconds_total', 'counter', 'Total time spent in each stage.',
+               [((('stage', name),), f"{stage['seconds']:.6f}") for name, stage in stages.items()])
+        metric('video2script_stage_runs_total', 'counter', 'Number of times each stage ran.',
+               [((('stage', name),), stage['count']) for name, stage in stages.items()])
+        metric('video2script_stage_errors_total', 'counter', 'Number of failed stage runs.',
+               [((('stage', name),), stage['errors']) for name, stage in stages.items()])
+        metric('video2script_stage_bytes_in_total', 'counter', 'Bytes read by each stage.',
+               [((('stage', name),), stage['bytes_in']) for name, stage in stages.items()])
+        metric('video2script_stage_bytes_out_total', 'counter', 'Bytes produced by each stage.',
+               [((('stage', name),), stage['bytes_out']) for name, stage in stages.items()])
+
+        metric('video2script_api_requests_total', 'counter', 'API requests by endpoint and status.',
+               [((('endpoint', path), ('status', code)), count)
+                for path, stats in api.items() for code, count in stats['status'].items()])
+        metric('video2script_api_retries_total', 'counter', 'API requests that were retries.',
+               [((('endpoint', path),), stats['retries']) for path, stats in api.items()])
+        metric('video2script_api_bytes_sent_total', 'counter', 'Request body bytes sent to the API.',
+               [((('endpoint', path),), stats['bytes_sent']) for path, stats in api.items()])
+        metric('video2script_api_bytes_received_total', 'counter', 'Response body bytes received from the API.',
+               [((('endpoint', path),), stats['bytes_received']) for path, stats in api.items()])
+
+        histogram = []
+        for path, stats in api.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], stats['buckets']):
+                cumulative += count
+                histogram.append(((('endpoint', path), ('le', str(bound))), cumulative))
+        lines.append("# HELP video2script_api_latency_seconds API request latency.")
+        lines.append("# TYPE video2script_api_latency_seconds histogram")
+        for labels, value in histogram:
+            label_text = ','.join(f'{key}="{val}"' for key, val in labels)
+            lines.append(f"video2script_api_latency_seconds_bucket{{{label_text}}} {value}")
+        for path, stats in api.items():
+            lines.append(f'video2script_api_latency_seconds_sum{{endpoint="{path}"}} {stats["latency_seconds"]:.6f}')
+            lines.append(f'video2script_api_latency_seconds_count{{endpoint="{path}"}} {stats["requests"]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self, path):
+        """导出Prometheus文本格式文件（供node exporter的textfile收集器读取）"""
+        _write_atomic(path, self.prometheus_text())
+        return path
+
+def _write_atomic(path, content):
+    """写入同目录下的临时文件后替换，避免读取到不完整的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """获取进程内共享的跟踪器"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+@contextmanager
+def span(name, **attributes):
+    """计时区间: with span('name') as s: s.set('bytes_in', n)"""
+    tracer = get_tracer()
+    current = tracer.start_span(name, **attributes)
+    token = _current_span.set(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        if tracer.enabled:
+            tracer.end_span(current, error)
+
+def traced(name=None, bytes_in=None, bytes_out=None):
+    """为函数添加计时区间；bytes_in接收参数字典，bytes_out接收返回值，分别计算输入输出字节数"""
+    def decorator(func):
+        signature = inspect.signature(func)
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as current:
+                if bytes_in is not None:
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    current.set('bytes_in', bytes_in(bound.arguments))
+                result = func(*args, **kwargs)
+                if bytes_out is not None:
+                    current.set('bytes_out', bytes_out(result))
+                return result
+        return wrapper
+    return decorator
+
+def bind(func):
+    """让线程池中执行的函数归属于提交时所在的区间"""
+    return bind_span(func, _current_span.get())
+
+def bind_span(func, parent):
+    """让函数在执行时归属于指定的区间"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return wrapper
+
+def record_api_call(*args, **kwargs):
+    get_tracer().record_api_call(*args, **kwargs)
+
+def export_configured():
+    """按配置导出跟踪文件与指标文件"""
+    tracer = get_tracer()
+    trace_file = settings.get('TRACE_FILE')
+    metrics_file = settings.get('METRICS_FILE')
+    if trace_file:
+        tracer.export_json(trace_file)
+    if metrics_file:
+        tracer.export_prometheus(metrics_file)
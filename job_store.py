@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import shutil
+import threading
+import config
+import settings
+from cache import hash_file, make_key
+
+class Job:
+    """单个视频的处理任务，各阶段的产出保存在任务目录中，用于断点续跑"""
+    def __init__(self, job_dir, video_path=None, content_hash=None):
+        self.job_dir = job_dir
+        self.video_path = video_path
+        # 视频内容的SHA-256，供转写缓存复用，避免再次读取整个文件
+        self.content_hash = content_hash
+        self.chunks_dir = os.path.join(job_dir, 'chunks')
+        self.manifest_path = os.path.join(job_dir, 'manifest.json')
+        self._lock = threading.Lock()
+        os.makedirs(self.chunks_dir, exist_ok=True)
+
+        self.manifest = self._read_json(self.manifest_path) or {'video_path': video_path, 'stages': {}}
+
+    def _read_json(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path, content):
+        """先写临时文件再替换，避免中断时留下不完整的检查点"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def _mark(self, stage):
+        """记录阶段完成时间"""
+        with self._lock:
+            self.manifest['stages'][stage] = time.time()
+            self._write_manifest()
+
+    def _unmark(self, stage):
+        with self._lock:
+            if self.manifest['stages'].pop(stage, None) is not None:
+                self._write_manifest()
+
+    def _write_manifest(self):
+        self._write_atomic(self.manifest_path, json.dumps(self.manifest, ensure_ascii=False, indent=2))
+
+    def completed(self, stage):
+        """阶段是否已完成"""
+        return stage in self.manifest['stages']
+
+    # 音频
+    @property
+    def audio_path(self):
+        return os.path.join(self.job_dir, 'audio.wav')
+
+    def has_audio(self):
+        return self.completed('audio') and os.path.exists(self.audio_path)
+
+    def save_audio(self, temp_audio_path):
+        """将提取出的临时音频移动到任务目录"""
+        shutil.move(temp_audio_path, self.audio_path)
+        self._mark('audio')
+        return self.audio_path
+
+    def discard_audio(self):
+        """删除已完成转写的音频，释放磁盘空间"""
+        if os.path.exists(self.audio_path):
+            os.unlink(self.audio_path)
+        self._unmark('audio')
+
+    # 分块转写结果
+    def _chunk_path(self, chunk):
+        name = f"{int(chunk['start'] * 1000):010d}_{int(chunk['end'] * 1000):010d}.json"
+        return os.path.join(self.chunks_dir, name)
+
+    def load_chunk(self, chunk):
+        """读取分块的转写文字，未完成返回None"""
+        saved = self._read_json(self._chunk_path(chunk))
+        return saved['text'] if saved else None
+
+    def save_chunk(self, chunk, text):
+        self._write_atomic(self._chunk_path(chunk),
+                           json.dumps({'start': chunk['start'], 'end': chunk['end'], 'text': text},
+                                      ensure_ascii=False))
+
+    # 文本阶段: raw（原始转写）、optimized（优化文本）
+    def load_text(self, stage):
+        if not self.completed(stage):
+            return None
+        try:
+            with open(os.path.join(self.job_dir, f'{stage}.txt'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save_text(self, stage, text):
+        self._write_atomic(os.path.join(self.job_dir, f'{stage}.txt'), text)
+        self._mark(stage)
+
+    # 优化分块（各块的原文与优化结果），续跑时按分块分析结构，与未中断时一致
+    def load_optimized_chunks(self):
+        if not self.completed('optimized'):
+            return None
+        return self._read_json(os.path.join(self.job_dir, 'optimized_chunks.json'))
+
+    def save_optimized_chunks(self, chunks):
+        """须在save_text('optimized')之前调用，保证优化阶段完成时分块结果已保存"""
+        self._write_atomic(os.path.join(self.job_dir, 'optimized_chunks.json'),
+                           json.dumps(chunks, ensure_ascii=False))
+
+    # 结构化内容
+    def load_structured(self):
+        if not self.completed('structured'):
+            return None
+        return self._read_json(os.path.join(self.job_dir, 'structured.json'))
+
+    def save_structured(self, structured_content):
+        self._write_atomic(os.path.join(self.job_dir, 'structured.json'),
+                           json.dumps(structured_content, ensure_ascii=False, indent=2))
+        self._mark('structured')
+
+    def invalidate(self, *stages):
+        """使指定阶段失效，之后会重新执行"""
+        for stage in stages:
+            self._unmark(stage)
+
+    def check_settings(self, name, settings, *stages):
+        """记录生成各阶段结果所用的设置（提示词版本、模型等）；
+        与上次保存的设置不同时使这些阶段失效，返回已保存的阶段结果是否仍可使用"""
+        saved = self.manifest.setdefault('settings', {}).get(name)
+        if saved == settings:
+            return True
+        if saved is not None:
+            stale = [stage for stage in stages if self.completed(stage)]
+            if stale:
+                print(f"处理设置已变化，重新执行: {', '.join(stale)}")
+            self.invalidate(*stages)
+        with self._lock:
+            self.manifest['settings'][name] = settings
+            self._write_manifest()
+        return saved is None
+
+class JobStore:
+    """任务目录管理，同一视频（内容与识别参数相同）对应同一任务目录"""
+    def __init__(self, root=None):
+        self.root = root or settings.get('JOB_DIR') or os.path.join(config.TEMP_DIR, 'jobs')
+        os.makedirs(self.root, exist_ok=True)
+
+    def job_id(self, video_path, content_hash=None):
+        return make_key(
+            content_hash or hash_file(video_path),
+            settings.get('TRANSCRIBE_MODEL'),
+            settings.get('TRANSCRIBE_LANGUAGE'),
+            config.AUDIO_SAMPLE_RATE
+        )[:16]
+
+    def open_job(self, video_path):
+        """打开（或新建）视频对应的任务"""
+        content_hash = hash_file(video_path)
+        return Job(os.path.join(self.root, self.job_id(video_path, content_hash)), video_path, content_hash)
+
+    def remove_job(self, job):
+        """删除任务目录；文档导出后调用，之后重新处理同一视频会从头执行"""
+        shutil.rmtree(job.job_dir, ignore_errors=True)
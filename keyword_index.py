@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import threading
+from collections import deque
+import settings
+
+# 内置的章节关键词，与模板中的章节标题合并使用
+DEFAULT_KEYWORDS = [
+    '第一部分', '第二部分', '第三部分',
+    '第一步', '第二步', '第三步',
+    '首先', '其次', '然后', '最后',
+    '培训目标', '操作步骤', '注意事项', '总结',
+    '设备介绍', '安全要求', '操作流程', '维护保养'
+]
+
+class KeywordIndex:
+    """多关键词匹配自动机（Aho–Corasick），一次扫描找出文本中最早出现的关键词"""
+    def __init__(self, keywords):
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self.max_length = max((len(k) for k in self.keywords), default=0)
+
+        # 字典树：每个节点的子节点、失配指针与在此结束的关键词（含后缀匹配到的）
+        self.children = [{}]
+        self.outputs = [[]]
+        for index, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                next_node = self.children[node].get(char)
+                if next_node is None:
+                    next_node = len(self.children)
+                    self.children[node][char] = next_node
+                    self.children.append({})
+                    self.outputs.append([])
+                node = next_node
+            self.outputs[node].append(index)
+
+        # 按层构建失配指针
+        self.fail = [0] * len(self.children)
+        pending = deque(self.children[0].values())
+        while pending:
+            node = pending.popleft()
+            for char, child in self.children[node].items():
+                fallback = self.fail[node]
+                while fallback and char not in self.children[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.children[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+                pending.append(child)
+
+        # 处于根节点时直接跳到下一个可能开始匹配的字符
+        first_chars = ''.join(self.children[0])
+        self.first_char_pattern = re.compile(f"[{re.escape(first_chars)}]") if first_chars else None
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def find(self, text, window=None):
+        """返回完整出现在前window个字符中、起始位置最早的关键词 (位置, 关键词)，起点相同时取最长的；没有时返回None"""
+        if window is not None:
+            text = text[:window]
+        if self.first_char_pattern is None:
+            return None
+        children = self.children
+        best = None
+        node = 0
+        position = 0
+        while position < len(text):
+            if node == 0:
+                match = self.first_char_pattern.search(text, position)
+                if match is None:
+                    break
+                position = match.start()
+            # 之后的匹配起点不可能早于已找到的匹配
+            if best is not None and position - best[0] >= self.max_length:
+                break
+            char = text[position]
+            while node and char not in children[node]:
+                node = self.fail[node]
+            node = children[node].get(char, 0)
+            for index in self.outputs[node]:
+                keyword = self.keywords[index]
+                start = position - len(keyword) + 1
+                if best is None or start < best[0] or (start == best[0] and len(keyword) > len(best[1])):
+                    best = (start, keyword)
+            position += 1
+        return best
+
+def load_keywords(path=None):
+    """加载章节关键词：内置关键词、DEFAULT_TEMPLATE中的章节标题，以及用户文件中的关键词；
+    用户文件可以是JSON（列表或含sections的对象）或每行一个关键词的文本文件"""
+    keywords = list(DEFAULT_KEYWORDS)
+    template = settings.get('DEFAULT_TEMPLATE') or {}
+    keywords.extend(template.get('sections', []))
+
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except Exception as e:
+            raise Exception(f"读取章节关键词文件失败: {str(e)}")
+        if path.lower().endswith('.json'):
+            data = json.loads(content)
+            keywords.extend(data.get('sections', []) if isinstance(data, dict) else data)
+        else:
+            keywords.extend(line.strip() for line in content.splitlines())
+    return [k.strip() for k in keywords if isinstance(k, str) and k.strip()]
+
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def get_keyword_index(path=None):
+    """获取编译好的关键词索引；关键词来源不变时复用，文件修改后重新编译"""
+    template = settings.get('DEFAULT_TEMPLATE') or {}
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+    key = (path, mtime, tuple(template.get('sections', [])))
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is None:
+            index = KeywordIndex(load_keywords(path))
+            _index_cache.clear()
+            _index_cache[key] = index
+        return index
@@ -7,6 +7,8 @@ Video2Script - 视频转脚本工具
 
 import sys
 import os
+import shutil
+import importlib.util
 import tkinter as tk
 from tkinter import messagebox
 
@@ -22,30 +24,20 @@ except ImportError as e:
     sys.exit(1)
 
 def check_dependencies():
-    """检查依赖包"""
-    required_packages = [
-        'tkinter',
-        'docx',
-        'moviepy',
-        'requests',
-        'PIL'
-    ]
+    """检查依赖包（只查找模块，不实际导入，避免拖慢启动）与ffmpeg"""
+    # 安装包名: 模块名
+    required_packages = {
+        'tkinter': 'tkinter',
+        'python-docx': 'docx',
+        'requests': 'requests',
+        'numpy': 'numpy',
+        'Pillow': 'PIL'
+    }
     
     missing_packages = []
     
-    for package in required_packages:
-        try:
-            if package == 'tkinter':
-                import tkinter
-            elif package == 'docx':
-                from docx import Document
-            elif package == 'moviepy':
-                from moviepy.editor import VideoFileClip
-            elif package == 'requests':
-                import requests
-            elif package == 'PIL':
-                from PIL import Image
-        except ImportError:
+    for package, module in required_packages.items():
+        if importlib.util.find_spec(module) is None:
             missing_packages.append(package)
     
     if missing_packages:
@@ -56,6 +48,14 @@ def check_dependencies():
         print("pip install -r requirements.txt")
         return False
     
+    return check_ffmpeg()
+
+def check_ffmpeg():
+    """检查音频提取所需的ffmpeg：PATH中的ffmpeg或imageio-ffmpeg自带的可执行文件"""
+    import audio_utils
+    if not (shutil.which('ffmpeg') or shutil.which(audio_utils.get_ffmpeg_binary())):
+        print("未找到ffmpeg，请安装ffmpeg并加入PATH，或运行: pip install imageio-ffmpeg")
+        return False
     return True
 
 def check_config():
@@ -68,6 +68,11 @@ def check_config():
 
 def main():
     """主函数"""
+    # 带命令行参数时以无界面批量模式运行，例如: python main.py videos/ -o output
+    if len(sys.argv) > 1:
+        from batch import main as batch_main
+        sys.exit(batch_main(sys.argv[1:]))
+    
     print("=" * 50)
     print("Video2Script - 视频转脚本工具")
     print(f"版本: {config.APP_VERSION}")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Video2Script 本地模拟API服务
+实现 /v1/audio/transcriptions 与 /v1/chat/completions，用于离线压测与延迟测试
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_SENTENCES = [
+    "欢迎来到技能操作培训课程。",
+    "今天我们将学习如何正确使用这个设备。",
+    "首先，让我们了解一下设备的基本组成部分。",
+    "设备主要由控制面板、操作区域和安全装置三个部分组成。",
+    "在开始操作之前，请确保您已经穿戴好必要的安全装备。",
+    "第一步，打开电源开关，电源开关位于设备的右侧。",
+    "第二步，检查设备状态指示灯，绿色表示设备正常运行。",
+    "第三步，根据工作需求调整相应的参数设置。",
+    "操作完成后，请按照正确的顺序关闭设备，并清理工作区域。",
+]
+
+def parse_latency(spec):
+    """解析延迟分布，例如 fixed:0.2、uniform:0.1,0.5、normal:0.3,0.1、lognormal:-1.5,0.5"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v] if params else []
+    if kind == 'fixed':
+        value = values[0] if values else 0.0
+        return lambda: value
+    if kind == 'uniform':
+        low, high = values
+        return lambda: random.uniform(low, high)
+    if kind == 'normal':
+        mean, std = values
+        return lambda: max(random.gauss(mean, std), 0.0)
+    if kind == 'lognormal':
+        mu, sigma = values
+        return lambda: random.lognormvariate(mu, sigma)
+    raise ValueError(f"不支持的延迟分布: {spec}")
+
+class MockApiState:
+    """模拟服务的配置与统计"""
+    def __init__(self, latency='fixed:0', latency_per_kb=0.0, error_rate=0.0,
+                 rate_429=0.0, retry_after=1.0, rpm=0, token_delay=0.02):
+        self.latency = parse_latency(latency)
+        self.latency_per_kb = latency_per_kb
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rpm = rpm
+        self.token_delay = token_delay
+
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.stats = {
+            'requests': 0,
+            'connections': 0,
+            'in_flight': 0,
+            'max_in_flight': 0,
+            'bytes_received': 0,
+            'status': {},
+            'paths': {}
+        }
+
+    def record(self, key, value=1):
+        with self.lock:
+            self.stats[key] += value
+
+    def record_status(self, path, status):
+        with self.lock:
+            self.stats['status'][str(status)] = self.stats['status'].get(str(status), 0) + 1
+            self.stats['paths'][path] = self.stats['paths'].get(path, 0) + 1
+
+    def over_rate_limit(self):
+        """按每分钟请求数限流（滑动窗口）"""
+        if not self.rpm:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.request_times and now - self.request_times[0] > 60:
+                self.request_times.popleft()
+            if len(self.request_times) >= self.rpm:
+                return True
+            self.request_times.append(now)
+            return False
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    """模拟API请求处理"""
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def setup(self):
+        super().setup()
+        self.state.record('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.state.record_status(self.path, status)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.state.snapshot())
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.state.record('requests')
+        self.state.record('bytes_received', len(body))
+
+        with self.state.lock:
+            self.state.stats['in_flight'] += 1
+            self.state.stats['max_in_flight'] = max(self.state.stats['max_in_flight'],
+                                                    self.state.stats['in_flight'])
+        try:
+            self._handle_post(body)
+        finally:
+            self.state.record('in_flight', -1)
+
+    def _handle_post(self, body):
+        state = self.state
+
+        # 注入限流与错误
+        if state.over_rate_limit() or random.random() < state.rate_429:
+            self._send_json(429, {'error': {'message': 'rate limit exceeded'}},
+                            {'Retry-After': str(state.retry_after)})
+            return
+        if random.random() < state.error_rate:
+            self._send_json(random.choice([500, 502, 503]), {'error': {'message': 'injected error'}})
+            return
+
+        time.sleep(state.latency() + state.latency_per_kb * len(body) / 1024.0)
+
+        if self.path == '/v1/audio/transcriptions':
+            self._transcribe(body)
+        elif self.path == '/v1/chat/completions':
+            self._chat(body)
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def _transcribe(self, body):
+        # 按上传数据量生成相应长度的文字（约每16KB一句）
+        count = max(1, min(len(body) // 16000, 200))
+        text = ''.join(MOCK_SENTENCES[i % len(MOCK_SENTENCES)] for i in range(count))
+        self._send_json(200, {'text': text})
+
+    def _chat(self, body):
+        try:
+            request = json.loads(body.decode('utf-8'))
+            content = request['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError):
+            self._send_json(400, {'error': {'message': 'invalid request'}})
+            return
+
+        # 返回提示词中的原文，模拟优化结果
+        match = re.search(r'原文：\s*(.*?)\s*要求：', content, re.S)
+        answer = match.group(1).strip() if match else content.strip()
+        usage = {'prompt_tokens': len(content), 'completion_tokens': len(answer),
+                 'total_tokens': len(content) + len(answer)}
+
+        if request.get('stream'):
+            self._stream_chat(answer)
+            return
+
+        self._send_json(200, {
+            'id': 'mock-completion',
+            'object': 'chat.completion',
+            'model': request.get('model', 'deepseek-chat'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer},
+                         'finish_reason': 'stop'}],
+            'usage': usage
+        })
+
+    def _stream_chat(self, answer):
+        """以SSE格式逐段返回结果"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_event(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+
+        for i in range(0, len(answer), 4):
+            delta = {'choices': [{'index': 0, 'delta': {'content': answer[i:i + 4]},
+                                  'finish_reason': None}]}
+            write_event(json.dumps(delta, ensure_ascii=False))
+            time.sleep(self.state.token_delay)
+        write_event(json.dumps({'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}))
+        write_event('[DONE]')
+        self.wfile.write(b"0\r\n\r\n")
+        self.state.record_status(self.path, 200)
+
+class MockApiServer:
+    """在后台线程中运行的模拟API服务"""
+    def __init__(self, host='127.0.0.1', port=0, **options):
+        self.httpd = ThreadingHTTPServer((host, port), MockApiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.state = MockApiState(**options)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Video2Script 本地模拟API服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0',
+                        help="延迟分布: fixed:秒 | uniform:下限,上限 | normal:均值,标准差 | lognormal:mu,sigma")
+    parser.add_argument('--latency-per-kb', type=float, default=0.0, help="每KB请求体额外延迟（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="返回5xx错误的概率")
+    parser.add_argument('--rate-429', type=float, default=0.0, help="随机返回429的概率")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="429响应的Retry-After（秒）")
+    parser.add_argument('--rpm', type=int, default=0, help="每分钟请求数上限，超出返回429（0表示不限）")
+    parser.add_argument('--token-delay', type=float, default=0.02, help="流式响应每段之间的间隔（秒）")
+    args = parser.parse_args()
+
+    server = MockApiServer(args.host, args.port, latency=args.latency,
+                           latency_per_kb=args.latency_per_kb, error_rate=args.error_rate,
+                           rate_429=args.rate_429, retry_after=args.retry_after,
+                           rpm=args.rpm, token_delay=args.token_delay)
+    print(f"模拟API服务已启动: {server.url}")
+    print(f"在config.py中设置 DEEPSEEK_API_BASE = \"{server.url}\" 即可使用")
+    print(f"统计信息: {server.url}/stats")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import os
+import uuid
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+class MultipartStream:
+    """流式multipart/form-data请求体，文件内容按固定大小的块从磁盘读取"""
+    def __init__(self, fields, file_field, filename, content_type,
+                 data=None, path=None, block_size=DEFAULT_BLOCK_SIZE):
+        if (data is None) == (path is None):
+            raise ValueError("data与path必须且只能指定一个")
+
+        self.boundary = uuid.uuid4().hex
+        self.block_size = block_size
+        self.path = path
+
+        # 请求体由若干部分组成：bytes为固定内容，None表示文件内容
+        head = b''
+        for name, value in fields.items():
+            head += self._part_header(name) + str(value).encode('utf-8') + b'\r\n'
+        head += self._part_header(file_field, filename, content_type)
+        tail = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+        if path is not None:
+            file_size = os.path.getsize(path)
+            self.parts = [head, None, tail]
+        else:
+            file_size = len(data)
+            self.parts = [head, bytes(data), tail]
+        self.length = len(head) + file_size + len(tail)
+
+        self._file = None
+        self.seek(0)
+
+    def _part_header(self, name, filename=None, content_type=None):
+        """生成单个表单字段的头部"""
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        header = f'--{self.boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            header += f'Content-Type: {content_type}\r\n'
+        return (header + '\r\n').encode('utf-8')
+
+    @property
+    def content_type(self):
+        """请求头中的Content-Type"""
+        return f'multipart/form-data; boundary={self.boundary}'
+
+    def __len__(self):
+        return self.length
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """只支持回到开头，用于请求重试"""
+        if offset != 0 or whence != os.SEEK_SET:
+            raise ValueError("MultipartStream只支持seek(0)")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._part_index = 0
+        self._part_offset = 0
+        self._position = 0
+        return 0
+
+    def read(self, size=-1):
+        """读取最多size字节，文件部分每次最多读取block_size字节"""
+        if size is None or size < 0:
+            size = self.block_size
+
+        while self._part_index < len(self.parts):
+            part = self.parts[self._part_index]
+            if part is None:
+                if self._file is None:
+                    self._file = open(self.path, 'rb')
+                chunk = self._file.read(min(size, self.block_size))
+                if not chunk:
+                    self._file.close()
+                    self._file = None
+            else:
+                chunk = part[self._part_offset:self._part_offset + size]
+                self._part_offset += len(chunk)
+
+            if chunk:
+                self._position += len(chunk)
+                return chunk
+
+            self._part_index += 1
+            self._part_offset = 0
+
+        return b''
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.block_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
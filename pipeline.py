@@ -0,0 +1,207 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import settings
+import audio_utils
+from job_store import JobStore
+
+STAGES = ['extract', 'transcribe', 'process', 'export']
+
+def extract_audio(video_path):
+    """提取音频（模块级函数，可在进程池中执行）"""
+    from speech_to_text import SpeechToText
+    return SpeechToText().extract_audio_from_video(video_path)
+
+class VideoPipeline:
+    """多视频异步流水线：音频提取、语音识别、文本处理、文档导出各阶段重叠执行"""
+    def __init__(self, speech_factory=None, text_processor_factory=None,
+                 document_processor=None, template_path=None, extract_executor=None):
+        if speech_factory is None:
+            from speech_to_text import SpeechToText
+            speech_factory = SpeechToText
+        if text_processor_factory is None:
+            from text_processor import TextProcessor
+            text_processor_factory = TextProcessor
+        if document_processor is None:
+            from document_processor import DocumentProcessor
+            document_processor = DocumentProcessor()
+
+        self.speech_factory = speech_factory
+        self.text_processor_factory = text_processor_factory
+        self.document_processor = document_processor
+        self.template_path = template_path
+
+        # 各阶段的并发数
+        self.workers = {
+            'extract': settings.get('PIPELINE_EXTRACT_WORKERS'),
+            'transcribe': settings.get('PIPELINE_TRANSCRIBE_WORKERS'),
+            'process': settings.get('PIPELINE_PROCESS_WORKERS'),
+            'export': settings.get('PIPELINE_EXPORT_WORKERS')
+        }
+        self.queue_size = settings.get('PIPELINE_QUEUE_SIZE')
+
+        # 音频提取可以交给进程池执行（需要可序列化的extract_audio函数）
+        self.extract_executor = extract_executor
+        self._local = threading.local()
+        
+        # 各阶段检查点，中断后重新运行时从上次完成的阶段继续
+        self.job_store = JobStore() if settings.get('JOBS_ENABLED') else None
+
+    def _speech(self):
+        """每个线程使用独立的语音识别实例，避免分块结果互相覆盖"""
+        if not hasattr(self._local, 'speech'):
+            self._local.speech = self.speech_factory()
+        return self._local.speech
+
+    def _text_processor(self):
+        if not hasattr(self._local, 'text_processor'):
+            self._local.text_processor = self.text_processor_factory()
+        return self._local.text_processor
+
+    def output_filename(self, job):
+        """生成输出文件名"""
+        name = os.path.splitext(os.path.basename(job['video_path']))[0]
+        return f"{name}_培训脚本.docx"
+
+    def _lookup(self, job):
+        """打开任务检查点并查询转写缓存"""
+        speech = self._speech()
+        if self.job_store is not None:
+            job['checkpoint'] = self.job_store.open_job(job['video_path'])
+        # 任务目录与转写缓存共用一次计算的文件哈希
+        content_hash = job['checkpoint'].content_hash if job['checkpoint'] is not None else None
+        job['cache_key'], job['text'] = speech.lookup_cache(job['video_path'], content_hash)
+        if job['text'] is not None:
+            job['audio_seconds'] = max([chunk['end'] for chunk in speech.last_chunks] or [0.0])
+        elif job['checkpoint'] is not None:
+            job['text'] = job['checkpoint'].load_text('raw')
+
+    def _record_audio(self, job, audio_path):
+        job['audio_path'] = audio_path
+        job['audio_seconds'] = audio_utils.wav_duration(audio_path)
+
+    def _transcribe(self, job):
+        speech = self._speech()
+        job['text'] = speech.transcribe_audio(job.pop('audio_path'), job['checkpoint'],
+                                              keep_audio=job.get('keep_audio', False))
+        speech.store_cache(job['cache_key'], job['text'])
+
+    def _process(self, job):
+        job['structured_content'] = self._text_processor().process_text(job['text'], job['checkpoint'])
+
+    def _export(self, job):
+        job['output_path'] = self.document_processor.export_to_docx(
+            job['structured_content'], self.template_path, self.output_filename(job))
+        # 文档已导出，删除任务检查点，之后重新运行会按当前设置重新处理
+        if job['checkpoint'] is not None:
+            self.job_store.remove_job(job['checkpoint'])
+
+    async def _extract_stage(self, job, executor):
+        """音频提取阶段：先查缓存，未命中再提取音频"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, self._lookup, job)
+        if job['text'] is None:
+            if audio_utils.is_pipeline_wav(job['video_path']):
+                # 已是转写所需格式的WAV，直接使用原文件（不移动也不删除）
+                job['keep_audio'] = True
+                self._record_audio(job, job['video_path'])
+                return
+            if job['checkpoint'] is not None and job['checkpoint'].has_audio():
+                self._record_audio(job, job['checkpoint'].audio_path)
+                return
+            if self.extract_executor is not None:
+                audio_path = await loop.run_in_executor(self.extract_executor,
+                                                        extract_audio, job['video_path'])
+            else:
+                audio_path = await loop.run_in_executor(
+                    executor, self._speech().extract_audio_from_video, job['video_path'])
+            if job['checkpoint'] is not None:
+                audio_path = job['checkpoint'].save_audio(audio_path)
+            self._record_audio(job, audio_path)
+
+    async def _call_stage(self, name, job, executor):
+        loop = asyncio.get_running_loop()
+        if name == 'extract':
+            await self._extract_stage(job, executor)
+        elif name == 'transcribe':
+            # 命中缓存的任务跳过语音识别
+            if job['text'] is None:
+                await loop.run_in_executor(executor, self._transcribe, job)
+        elif name == 'process':
+            await loop.run_in_executor(executor, self._process, job)
+        else:
+            await loop.run_in_executor(executor, self._export, job)
+
+    async def _run_stage(self, name, in_queue, out_queue, next_workers, executor, on_done):
+        """运行一个阶段的全部工作协程，结束后向下游发送结束标记"""
+        async def worker():
+            while True:
+                job = await in_queue.get()
+                if job is None:
+                    break
+                if job['error'] is None:
+                    start = time.perf_counter()
+                    try:
+                        await self._call_stage(name, job, executor)
+                    except Exception as e:
+                        job['error'] = f"{name}: {str(e)}"
+                    job['timings'][name] = time.perf_counter() - start
+                if out_queue is not None:
+                    # 下游队列已满时在此等待，形成背压
+                    await out_queue.put(job)
+                else:
+                    on_done(job)
+
+        await asyncio.gather(*[worker() for _ in range(self.workers[name])])
+        if out_queue is not None:
+            for _ in range(next_workers):
+                await out_queue.put(None)
+
+    async def run(self, video_paths, on_done=None):
+        """处理多个视频，返回每个视频的处理结果"""
+        jobs = [{
+            'video_path': path,
+            'text': None,
+            'output_path': None,
+            'audio_seconds': 0.0,
+            'error': None,
+            'checkpoint': None,
+            'timings': {}
+        } for path in video_paths]
+
+        def finish(job):
+            # 清理失败任务遗留的临时音频（任务目录中的音频保留，用于续跑）
+            audio_path = job.pop('audio_path', None)
+            if (audio_path and job['checkpoint'] is None and not job.get('keep_audio')
+                    and os.path.exists(audio_path)):
+                os.unlink(audio_path)
+            if on_done:
+                on_done(job)
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES]
+        executors = {name: ThreadPoolExecutor(max_workers=self.workers[name]) for name in STAGES}
+        try:
+            tasks = []
+            for i, name in enumerate(STAGES):
+                out_queue = queues[i + 1] if i + 1 < len(STAGES) else None
+                next_workers = self.workers[STAGES[i + 1]] if out_queue is not None else 0
+                tasks.append(asyncio.ensure_future(self._run_stage(
+                    name, queues[i], out_queue, next_workers, executors[name], finish)))
+
+            for job in jobs:
+                await queues[0].put(job)
+            for _ in range(self.workers[STAGES[0]]):
+                await queues[0].put(None)
+
+            await asyncio.gather(*tasks)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True)
+
+        return jobs
+
+    def run_sync(self, video_paths, on_done=None):
+        """同步接口"""
+        return asyncio.run(self.run(video_paths, on_done))
@@ -0,0 +1,185 @@
+import time
+import threading
+import settings
+
+class TokenBucket:
+    """令牌桶：每分钟补充per_minute个令牌，最多积累burst_seconds秒的用量；
+    采用预约方式，令牌不足时返回需要等待的时间，保证先到先得"""
+    def __init__(self, per_minute, burst_seconds=10):
+        self.per_minute = per_minute or 0
+        self.rate = self.per_minute / 60.0
+        self.capacity = max(self.rate * burst_seconds, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity)
+        self.updated = now
+
+    def reserve(self, amount, now=None):
+        """预约amount个令牌，返回需要等待的秒数；未设置上限时不等待"""
+        if not self.rate or amount <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= amount
+        return max(-self.tokens / self.rate, 0.0)
+
+    def refund(self, amount):
+        """按实际用量修正预约（amount为负时补扣）"""
+        if self.rate:
+            self.tokens = min(self.tokens + amount, self.capacity)
+
+    def available(self):
+        if not self.rate:
+            return None
+        self._refill(time.monotonic())
+        return max(self.tokens, 0.0)
+
+class RateLimiter:
+    """API请求调度：按每分钟请求数（RPM）与每分钟token数（TPM）限流，
+    各接口的并发上限按AIMD调整——请求成功时缓慢增加，遇到429或耗时突增时减半"""
+    def __init__(self, rpm=None, tpm=None, concurrency=None, min_concurrency=None,
+                 max_concurrency=None):
+        burst_seconds = settings.get('RATE_LIMIT_BURST_SECONDS')
+        self.rpm = TokenBucket(settings.get('RATE_LIMIT_RPM') if rpm is None else rpm, burst_seconds)
+        self.tpm = TokenBucket(settings.get('RATE_LIMIT_TPM') if tpm is None else tpm, burst_seconds)
+        self.initial_concurrency = concurrency or settings.get('RATE_LIMIT_CONCURRENCY')
+        self.min_concurrency = min_concurrency or settings.get('RATE_LIMIT_MIN_CONCURRENCY')
+        self.max_concurrency = max_concurrency or settings.get('RATE_LIMIT_MAX_CONCURRENCY')
+        self.decrease_factor = settings.get('RATE_LIMIT_DECREASE')
+        self.latency_spike = settings.get('RATE_LIMIT_LATENCY_SPIKE')
+        self.pause_seconds = settings.get('RATE_LIMIT_PAUSE')
+
+        self._condition = threading.Condition()
+        self.endpoints = {}
+        self.paused_until = 0.0
+        self.stats = {
+            'throttled': 0,
+            'throttle_seconds': 0.0,
+            'rate_limited': 0,
+            'latency_spikes': 0,
+            'decreases': 0
+        }
+
+    def _endpoint(self, path):
+        endpoint = self.endpoints.get(path)
+        if endpoint is None:
+            endpoint = self.endpoints[path] = {
+                'limit': float(self.initial_concurrency),
+                'in_flight': 0,
+                # 普通响应与流式响应（按首字节耗时）分别统计耗时基线
+                'latency': {},
+                'last_decrease': 0.0
+            }
+        return endpoint
+
+    def acquire(self, path, tokens=0, size=None):
+        """等待并发名额与RPM/TPM令牌，返回请求许可；请求结束后须调用release
+        
+        size为请求规模（token数或上传字节数），用于按规模折算耗时，缺省时取tokens
+        """
+        with self._condition:
+            endpoint = self._endpoint(path)
+            while endpoint['in_flight'] >= int(endpoint['limit']):
+                self._condition.wait()
+            endpoint['in_flight'] += 1
+            now = time.monotonic()
+            wait = max(self.paused_until - now, self.rpm.reserve(1, now), self.tpm.reserve(tokens, now), 0.0)
+            if wait > 0:
+                self.stats['throttled'] += 1
+                self.stats['throttle_seconds'] += wait
+        if wait > 0:
+            time.sleep(wait)
+        return {'path': path, 'tokens': tokens, 'size': tokens if size is None else size,
+                'start': time.monotonic()}
+
+    def _latency_spike(self, endpoint, kind, latency, size):
+        """按请求规模折算耗时并更新基线，返回是否为耗时突增；
+        大于平均规模的请求按比例放宽，小请求不收紧（固定开销占比更大）"""
+        stats = endpoint['latency'].setdefault(kind, {'baseline': None, 'size': None, 'samples': 0})
+        scale = 1.0
+        if size:
+            if stats['size'] is not None:
+                scale = max(size / stats['size'], 1.0)
+            stats['size'] = size if stats['size'] is None else stats['size'] * 0.9 + size * 0.1
+        latency /= scale
+
+        baseline = stats['baseline']
+        spike = (baseline is not None and stats['samples'] >= 5
+                 and latency > baseline * self.latency_spike)
+        # 耗时基线取指数加权平均；突增的耗时以较小权重计入：偶发的慢请求影响不大，
+        # 耗时持续升高时基线随之上移，并发上限不会一直停留在最低值
+        weight = 0.05 if spike else 0.1
+        stats['baseline'] = latency if baseline is None else baseline * (1 - weight) + latency * weight
+        stats['samples'] += 1
+        return spike
+
+    def release(self, permit, status=None, tokens_used=None, retry_after=None, timeout=False,
+                latency=None, streamed=False):
+        """请求结束：按响应状态与耗时调整并发上限，按实际token用量修正TPM；
+        latency缺省时取许可发出至今的时间，流式响应传入首字节耗时并设置streamed"""
+        now = time.monotonic()
+        if latency is None:
+            latency = now - permit['start']
+        with self._condition:
+            endpoint = self._endpoint(permit['path'])
+            endpoint['in_flight'] -= 1
+            if tokens_used is not None:
+                self.tpm.refund(permit['tokens'] - tokens_used)
+
+            congested = False
+            if status == 429:
+                # 所有请求暂停一段时间，避免同时重试
+                self.stats['rate_limited'] += 1
+                self.paused_until = max(self.paused_until, now + (retry_after or self.pause_seconds))
+                congested = True
+            elif timeout:
+                congested = True
+            elif status is not None and status < 400:
+                if self._latency_spike(endpoint, 'stream' if streamed else 'response',
+                                       latency, permit['size']):
+                    self.stats['latency_spikes'] += 1
+                    congested = True
+
+            if congested:
+                # 同一批并发请求只减少一次，避免连续的429把并发降到最低
+                if permit['start'] >= endpoint['last_decrease']:
+                    endpoint['limit'] = max(endpoint['limit'] * self.decrease_factor, self.min_concurrency)
+                    endpoint['last_decrease'] = now
+                    self.stats['decreases'] += 1
+            elif status is not None and status < 400:
+                endpoint['limit'] = min(endpoint['limit'] + 1.0 / endpoint['limit'], self.max_concurrency)
+            self._condition.notify_all()
+
+    def snapshot(self):
+        """当前的限流设置与各接口的并发上限"""
+        with self._condition:
+            now = time.monotonic()
+            rpm_available = self.rpm.available()
+            tpm_available = self.tpm.available()
+            return {
+                'rpm_limit': self.rpm.per_minute or None,
+                'tpm_limit': self.tpm.per_minute or None,
+                'rpm_available': round(rpm_available, 1) if rpm_available is not None else None,
+                'tpm_available': round(tpm_available, 1) if tpm_available is not None else None,
+                'paused_seconds': round(max(self.paused_until - now, 0.0), 3),
+                'stats': dict(self.stats),
+                'endpoints': {path: {
+                    'concurrency_limit': int(endpoint['limit']),
+                    'in_flight': endpoint['in_flight'],
+                    'latency_baseline': {kind: stats['baseline']
+                                         for kind, stats in endpoint['latency'].items()}
+                } for path, endpoint in self.endpoints.items()}
+            }
+
+    def describe(self):
+        """当前限流状态的一行说明"""
+        snapshot = self.snapshot()
+        parts = [f"{path} 并发 {endpoint['concurrency_limit']}"
+                 for path, endpoint in snapshot['endpoints'].items()]
+        parts.append(f"RPM {snapshot['rpm_limit'] or '不限'}")
+        parts.append(f"TPM {snapshot['tpm_limit'] or '不限'}")
+        stats = snapshot['stats']
+        parts.append(f"429 {stats['rate_limited']} 次, 限流等待 {stats['throttle_seconds']:.1f} 秒")
+        return ", ".join(parts)
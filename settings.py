@@ -0,0 +1,91 @@
+import config
+
+# 可选配置项的默认值：config.py中未设置（如沿用旧版配置文件）时使用，须与config_example.py保持一致
+DEFAULTS = {
+    # HTTP连接
+    'HTTP_POOL_SIZE': 0,
+    'HTTP_CONNECT_TIMEOUT': 10,
+    'HTTP_READ_TIMEOUT': 300,
+    'HTTP_MAX_RETRIES': 4,
+    'HTTP_BACKOFF_BASE': 1.0,
+    'HTTP_BACKOFF_MAX': 30.0,
+
+    # API限流调度
+    'RATE_LIMIT_ENABLED': True,
+    'RATE_LIMIT_RPM': 0,
+    'RATE_LIMIT_TPM': 0,
+    'RATE_LIMIT_BURST_SECONDS': 10,
+    'RATE_LIMIT_CONCURRENCY': 4,
+    'RATE_LIMIT_MIN_CONCURRENCY': 1,
+    'RATE_LIMIT_MAX_CONCURRENCY': 16,
+    'RATE_LIMIT_DECREASE': 0.5,
+    'RATE_LIMIT_LATENCY_SPIKE': 3.0,
+    'RATE_LIMIT_PAUSE': 1.0,
+
+    # 文件格式与模板
+    'SUPPORTED_AUDIO_FORMATS': ['.wav', '.mp3', '.m4a', '.aac', '.flac', '.ogg'],
+    'DEFAULT_TEMPLATE': None,
+    'SECTION_KEYWORDS_FILE': None,
+
+    # 音频提取
+    'AUDIO_EXTRACT_MODE': 'stream',
+    'AUDIO_EXTRACT_WORKERS': 0,
+    'AUDIO_PARALLEL_MIN_SECONDS': 60,
+    'AUDIO_STREAM_BLOCK_SECONDS': 1,
+
+    # 语音识别
+    'TRANSCRIBE_MODEL': 'deepseek-whisper',
+    'TRANSCRIBE_LANGUAGE': 'zh',
+    'UPLOAD_AUDIO_CODEC': 'flac',
+    'UPLOAD_OPUS_BITRATE': '24k',
+    'TRANSCRIBE_CHUNK_SECONDS': 120,
+    'TRANSCRIBE_CHUNK_OVERLAP_SECONDS': 2,
+    'TRANSCRIBE_WORKERS': 4,
+
+    # 语音活动检测
+    'VAD_ENABLED': True,
+    'VAD_FRAME_MS': 30,
+    'VAD_THRESHOLD_DB': 12,
+    'VAD_MIN_ENERGY_DB': -50,
+    'VAD_MIN_SPEECH_MS': 250,
+    'VAD_MIN_SILENCE_MS': 800,
+    'VAD_PADDING_MS': 200,
+    'VAD_JOIN_GAP_MS': 300,
+
+    # 缓存
+    'CACHE_DIR': 'cache',
+    'TRANSCRIPTION_CACHE_ENABLED': True,
+    'TRANSCRIPTION_CACHE_MAX_MB': 200,
+    'LLM_CACHE_ENABLED': True,
+    'LLM_CACHE_MAX_MB': 100,
+    'LLM_CACHE_TTL_DAYS': 30,
+
+    # 任务检查点（JOB_DIR为None时使用TEMP_DIR下的jobs目录）
+    'JOBS_ENABLED': True,
+    'JOB_DIR': None,
+    'JOB_KEEP_AUDIO': False,
+
+    # 跟踪与指标
+    'TRACING_ENABLED': True,
+    'TRACE_FILE': None,
+    'METRICS_FILE': None,
+    'TRACE_MAX_SPANS': 10000,
+
+    # 多视频流水线
+    'PIPELINE_EXTRACT_WORKERS': 2,
+    'PIPELINE_TRANSCRIBE_WORKERS': 2,
+    'PIPELINE_PROCESS_WORKERS': 2,
+    'PIPELINE_EXPORT_WORKERS': 1,
+    'PIPELINE_QUEUE_SIZE': 2,
+
+    # 文本优化
+    'OPTIMIZE_WORKERS': 4,
+    'OPTIMIZE_STREAM': True,
+    'OPTIMIZE_MAX_TOKENS': 8000,
+    'OPTIMIZE_CHUNK_TOKENS': 6000,
+    'TOKEN_ESTIMATE_SCALE': 1.0,
+}
+
+def get(name):
+    """读取配置项，config.py中未设置时使用DEFAULTS中的默认值；每次调用时读取，运行中修改config同样生效"""
+    return getattr(config, name, DEFAULTS[name])
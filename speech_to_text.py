@@ -1,16 +1,49 @@
 import os
 import tempfile
-import requests
 import json
-from moviepy.editor import VideoFileClip
-from pydub import AudioSegment
+import struct
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import config
+import settings
+import audio_utils
+import instrumentation
+from multipart import MultipartStream
+from cache import TranscriptionCache
+from http_client import get_shared_client
+from text_processor import merge_overlap
 
 class SpeechToText:
     def __init__(self):
         self.api_key = config.DEEPSEEK_API_KEY
         self.api_base = config.DEEPSEEK_API_BASE
+        self.client = get_shared_client()
+        self.last_chunks = []
         
+        # 进度回调: callback(新增文字, 已处理音频秒数, 音频总秒数)
+        self.progress_callback = None
+        self._total_seconds = None
+        
+        # 转写结果缓存
+        self.cache = None
+        if settings.get('TRANSCRIPTION_CACHE_ENABLED'):
+            self.cache = TranscriptionCache()
+        
+    def stream_audio_from_video(self, video_path, block_seconds=None):
+        """流式提取音频，逐块产出16kHz单声道PCM数据"""
+        try:
+            if settings.get('AUDIO_EXTRACT_MODE') == 'parallel':
+                blocks = audio_utils.stream_pcm_parallel(video_path, block_seconds=block_seconds,
+                                                         duration=self._total_seconds)
+            else:
+                blocks = audio_utils.stream_pcm(video_path, block_seconds=block_seconds)
+            for block in blocks:
+                yield block
+        except Exception as e:
+            raise Exception(f"音频提取失败: {str(e)}")
+    
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.file_size(args['video_path']),
+                            bytes_out=instrumentation.file_size)
     def extract_audio_from_video(self, video_path):
         """从视频文件中提取音频"""
         try:
@@ -19,7 +52,19 @@ class SpeechToText:
             temp_audio_path = temp_audio.name
             temp_audio.close()
             
-            # 使用moviepy提取音频
+            # 并行模式：按时间段由多个ffmpeg进程同时解码，再按顺序拼接
+            mode = settings.get('AUDIO_EXTRACT_MODE')
+            if mode == 'parallel':
+                audio_utils.write_wav(audio_utils.stream_pcm_parallel(video_path), temp_audio_path)
+                return temp_audio_path
+            
+            # 流式模式：只解码音频流，边解码边写入；音频文件只需一次重采样，不经过VideoFileClip
+            if mode == 'stream' or audio_utils.is_audio_file(video_path):
+                audio_utils.write_wav(audio_utils.stream_pcm(video_path), temp_audio_path)
+                return temp_audio_path
+            
+            # 使用moviepy提取音频（导入较慢，仅在此模式下导入）
+            from moviepy.editor import VideoFileClip
             video = VideoFileClip(video_path)
             audio = video.audio
             
@@ -37,63 +82,331 @@ class SpeechToText:
         except Exception as e:
             raise Exception(f"音频提取失败: {str(e)}")
     
-    def convert_audio_to_text(self, audio_path):
-        """使用DeepSeek API将音频转换为文字"""
+    def _request_transcription(self, audio, filename='audio.wav', mime_type='audio/wav'):
+        """发送一次转写请求，audio为音频数据或音频文件路径，返回识别出的文字"""
+        fields = {
+            'model': settings.get('TRANSCRIBE_MODEL'),
+            'language': settings.get('TRANSCRIBE_LANGUAGE'),
+            'response_format': 'json'
+        }
+        
+        # 请求体按块流式生成，文件内容不整体读入内存
+        if isinstance(audio, (bytes, bytearray)):
+            body = MultipartStream(fields, 'file', filename, mime_type, data=audio)
+        else:
+            body = MultipartStream(fields, 'file', filename, mime_type, path=audio)
+        
+        try:
+            # 通过共享客户端发送请求到DeepSeek API
+            response = self.client.post(
+                "/v1/audio/transcriptions",
+                headers={'Content-Type': body.content_type},
+                data=body
+            )
+        finally:
+            body.close()
+        
+        if response.status_code == 200:
+            result = response.json()
+            return result.get('text', '')
+        else:
+            raise Exception(f"API请求失败: {response.status_code} - {response.text}")
+    
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.file_size(args['audio_path']),
+                            bytes_out=instrumentation.text_size)
+    def convert_audio_to_text(self, audio_path, job=None, keep_audio=False):
+        """使用DeepSeek API将音频转换为文字；keep_audio为True时不删除音频文件"""
+        upload_path = audio_path
         try:
-            # 读取音频文件
-            with open(audio_path, 'rb') as audio_file:
-                audio_data = audio_file.read()
+            # 按配置的上传格式转码
+            upload_path, mime_type = audio_utils.encode_audio_file(audio_path)
             
-            # 准备API请求
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'multipart/form-data'
+            # 直接从磁盘流式上传
+            filename = 'audio' + os.path.splitext(upload_path)[1]
+            return self._request_transcription(upload_path, filename, mime_type)
+                
+        except Exception as e:
+            raise Exception(f"语音转文字失败: {str(e)}")
+        finally:
+            # 清理临时文件（任务目录中的音频由任务管理）
+            if upload_path != audio_path and os.path.exists(upload_path):
+                os.unlink(upload_path)
+            if job is None and not keep_audio and os.path.exists(audio_path):
+                os.unlink(audio_path)
+    
+    def _transcribe_pcm(self, pcm_data, name):
+        """按配置的上传格式编码PCM数据并转写"""
+        audio_data, extension, mime_type = audio_utils.encode_pcm(pcm_data)
+        return self._request_transcription(audio_data, name + extension, mime_type)
+    
+    def _transcribe_chunk(self, chunk, job=None):
+        """转写单个分块，并保存分块检查点"""
+        text = self._transcribe_pcm(chunk['pcm'], f"chunk_{int(chunk['start'] * 1000):010d}")
+        if job is not None:
+            job.save_chunk(chunk, text)
+        return text
+    
+    def _window_chunks(self, pcm_blocks):
+        """将PCM数据流切分为带重叠的上传分块"""
+        chunk_seconds = settings.get('TRANSCRIBE_CHUNK_SECONDS')
+        overlap_seconds = settings.get('TRANSCRIBE_CHUNK_OVERLAP_SECONDS')
+        
+        for start, pcm_data in audio_utils.iter_windows(pcm_blocks, chunk_seconds, overlap_seconds):
+            duration = audio_utils.bytes_to_seconds(len(pcm_data))
+            yield {
+                'start': start,
+                'end': start + duration,
+                'pcm': pcm_data,
+                'overlap': start > 0 and overlap_seconds > 0,
+                'segments': [(0.0, start, duration)]
             }
-            
-            files = {
-                'file': ('audio.wav', audio_data, 'audio/wav'),
-                'model': (None, 'deepseek-whisper'),
-                'language': (None, 'zh'),
-                'response_format': (None, 'json')
+    
+    def _report_progress(self, text, processed_seconds):
+        """通知调用方新转写出的文字与处理进度"""
+        if self.progress_callback is not None:
+            total = self._total_seconds or processed_seconds
+            self.progress_callback(text, min(processed_seconds, total), total)
+    
+    def transcribe_chunks(self, chunks, job=None):
+        """并发转写音频分块，按顺序拼接结果；指定任务时跳过已完成的分块"""
+        workers = max(settings.get('TRANSCRIBE_WORKERS'), 1)
+        results = []
+        pending = deque()
+        
+        # 按每秒约10个字估计重叠区的文字长度，限制去重的搜索范围
+        overlap_seconds = settings.get('TRANSCRIBE_CHUNK_OVERLAP_SECONDS')
+        max_overlap = int(overlap_seconds * 10) + 10
+        state = {'text': '', 'emitted': 0}
+        
+        def collect():
+            chunk, future = pending.popleft()
+            result = {
+                'start': chunk['start'],
+                'end': chunk['end'],
+                'overlap': chunk['overlap'],
+                'segments': chunk['segments'],
+                'text': future.result().strip()
             }
+            results.append(result)
             
-            # 发送请求到DeepSeek API
-            response = requests.post(
-                f"{self.api_base}/v1/audio/transcriptions",
-                headers=headers,
-                files=files
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('text', '')
+            # 按顺序拼接；末尾可能被下一分块的去重修改的部分暂不输出
+            if result['overlap']:
+                state['text'] = merge_overlap(state['text'], result['text'], max_overlap)
             else:
-                raise Exception(f"API请求失败: {response.status_code} - {response.text}")
-                
+                state['text'] += result['text']
+            stable = max(len(state['text']) - max_overlap, state['emitted'])
+            self._report_progress(state['text'][state['emitted']:stable], result['end'])
+            state['emitted'] = stable
+        
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for chunk in chunks:
+                # 限制在途分块数量，解码速度快于上传时在此等待，保持内存平稳
+                while len(pending) >= workers * 2:
+                    collect()
+                saved = job.load_chunk(chunk) if job is not None else None
+                if saved is not None:
+                    future = Future()
+                    future.set_result(saved)
+                else:
+                    # 编码在工作线程中进行，与解码和上传并行
+                    future = executor.submit(instrumentation.bind(self._transcribe_chunk), chunk, job)
+                # 分块提交后只保留元数据，释放PCM数据
+                pending.append((dict(chunk, pcm=None), future))
+            while pending:
+                collect()
         except Exception as e:
             raise Exception(f"语音转文字失败: {str(e)}")
         finally:
-            # 清理临时文件
-            if os.path.exists(audio_path):
+            # 任一分块失败时取消排队中的分块，不等待它们上传完成
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        # 保留各分块在原始时间轴上的位置，便于与视频对齐
+        self.last_chunks = results
+        
+        text = state['text']
+        # 总时长未知时以最后一个分块的结束时间作为总时长，保证结束时进度为100%
+        total = self._total_seconds or max([result['end'] for result in results] or [1.0])
+        self._report_progress(text[state['emitted']:], total)
+        return text
+    
+    def transcribe_pcm_stream(self, pcm_blocks, job=None):
+        """将PCM数据流按时间窗口分块，并发转写后按顺序拼接"""
+        return self.transcribe_chunks(self._window_chunks(pcm_blocks), job)
+    
+    def transcribe_speech_regions(self, audio_path, job=None):
+        """检测语音区域，只转写有声部分"""
+        import vad
+        chunk_seconds = settings.get('TRANSCRIBE_CHUNK_SECONDS')
+        overlap_seconds = settings.get('TRANSCRIBE_CHUNK_OVERLAP_SECONDS')
+        
+        samples, sample_rate = vad.read_wav_samples(audio_path)
+        chunks = None
+        try:
+            regions = vad.detect_speech_regions(samples, sample_rate)
+            total_seconds = len(samples) / float(sample_rate)
+            self._total_seconds = total_seconds
+            speech_seconds = sum(end - start for start, end in regions) / float(sample_rate)
+            print(f"检测到语音 {speech_seconds:.1f} 秒 / 总时长 {total_seconds:.1f} 秒")
+            
+            chunks = vad.iter_speech_chunks(samples, regions, sample_rate,
+                                            chunk_seconds, overlap_seconds)
+            return self.transcribe_chunks(chunks, job)
+        finally:
+            # 失败时异常回溯和分片生成器仍引用采样数组，del无法释放映射；
+            # 先关闭生成器，再显式关闭内存映射，调用方才能删除临时WAV文件
+            if chunks is not None:
+                chunks.close()
+            vad.close_samples(samples)
+            del samples
+    
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.file_size(args['audio_path']),
+                            bytes_out=instrumentation.text_size)
+    def convert_audio_to_text_chunked(self, audio_path, job=None, keep_audio=False):
+        """分块并发转写音频文件；keep_audio为True时不删除音频文件"""
+        try:
+            if settings.get('VAD_ENABLED'):
+                return self.transcribe_speech_regions(audio_path, job)
+            return self.transcribe_pcm_stream(audio_utils.iter_wav_pcm(audio_path), job)
+        finally:
+            # 清理临时文件（任务目录中的音频由任务管理）
+            if job is None and not keep_audio and os.path.exists(audio_path):
                 os.unlink(audio_path)
     
-    def process_video(self, video_path):
-        """处理视频文件，返回转换的文字"""
-        print("正在提取音频...")
-        audio_path = self.extract_audio_from_video(video_path)
+    def lookup_cache(self, video_path, content_hash=None):
+        """查询转写缓存，返回(缓存键, 缓存的文字)；未启用缓存或未命中时文字为None"""
+        if self.cache is None:
+            return None, None
+        
+        cache_key = self.cache.key_for(video_path, content_hash)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        
+        self.last_chunks = cached.get('chunks', [])
+        return cache_key, cached['text']
+    
+    def store_cache(self, cache_key, text):
+        """将转写结果写入缓存"""
+        if self.cache is not None and cache_key is not None:
+            self.cache.set(cache_key, {'text': text, 'chunks': self.last_chunks})
+    
+    def process_video(self, video_path, job=None, progress_callback=None):
+        """处理视频文件，返回转换的文字；指定任务时从上次完成的阶段继续
         
-        print("正在进行语音识别...")
-        text = self.convert_audio_to_text(audio_path)
+        progress_callback(新增文字, 已处理音频秒数, 音频总秒数) 在每个分块完成时按顺序调用
+        """
+        if progress_callback is not None:
+            self.progress_callback = progress_callback
+        self._total_seconds = None
+        try:
+            # 命中缓存时跳过音频提取和语音识别
+            cache_key, text = self.lookup_cache(video_path, job.content_hash if job is not None else None)
+            if text is not None:
+                print("命中转写缓存，跳过语音识别")
+            elif job is not None and job.load_text('raw') is not None:
+                print("使用已保存的转写结果")
+                text = job.load_text('raw')
+                self.store_cache(cache_key, text)
+            else:
+                text = self.transcribe_video(video_path, job)
+                self.store_cache(cache_key, text)
+                return text
+            
+            self._report_progress(text, 1.0)
+            return text
+        finally:
+            if progress_callback is not None:
+                self.progress_callback = None
+    
+    def transcribe_video(self, video_path, job=None):
+        """提取视频音频并转写为文字；也可直接传入音频文件"""
+        if audio_utils.is_pipeline_wav(video_path):
+            # 已是16kHz单声道PCM WAV，直接转写原文件，不重新编码也不删除
+            print("音频格式符合要求，跳过音频提取")
+            return self.transcribe_audio(video_path, job, keep_audio=True)
+        
+        if ((job is None or not job.has_audio())
+                and settings.get('TRANSCRIBE_CHUNK_SECONDS') > 0
+                and settings.get('AUDIO_EXTRACT_MODE') in ('stream', 'parallel')
+                and not settings.get('VAD_ENABLED')):
+            # 分块模式：边解码边转写，无需先写出完整音频文件；
+            # 指定任务时按分块保存检查点，中断后重新解码但跳过已完成的分块
+            print("正在提取音频并分块进行语音识别...")
+            self._total_seconds = audio_utils.probe_duration(video_path)
+            text = self.transcribe_pcm_stream(self.stream_audio_from_video(video_path), job)
+            if job is not None:
+                job.save_text('raw', text)
+            return text
         
+        # 其他情况先写出WAV文件再转写（语音活动检测需通过内存映射随机访问音频）
+        if job is not None and job.has_audio():
+            print("使用已提取的音频")
+            audio_path = job.audio_path
+        else:
+            print("正在提取音频...")
+            audio_path = self.extract_audio_from_video(video_path)
+            if job is not None:
+                audio_path = job.save_audio(audio_path)
+        return self.transcribe_audio(audio_path, job)
+    
+    def transcribe_audio(self, audio_path, job=None, keep_audio=False):
+        """转写已提取的音频文件；未指定任务且keep_audio为False时完成后删除该文件"""
+        # 按文件头计算音频总时长，用于报告转写进度
+        try:
+            self._total_seconds = audio_utils.wav_duration(audio_path)
+        except (OSError, ValueError, struct.error):
+            self._total_seconds = None
+        if settings.get('TRANSCRIBE_CHUNK_SECONDS') > 0:
+            print("正在分块进行语音识别...")
+            text = self.convert_audio_to_text_chunked(audio_path, job, keep_audio)
+        else:
+            print("正在进行语音识别...")
+            text = self.convert_audio_to_text(audio_path, job, keep_audio)
+            self._report_progress(text, self._total_seconds or 1.0)
+        
+        if job is not None:
+            job.save_text('raw', text)
+            if not settings.get('JOB_KEEP_AUDIO'):
+                job.discard_audio()
         return text
 
 class MockSpeechToText:
     """模拟语音转文字类，用于测试"""
     def __init__(self):
+        self.last_chunks = []
+    
+    def lookup_cache(self, video_path, content_hash=None):
+        """模拟模式不使用缓存"""
+        return None, None
+    
+    def store_cache(self, cache_key, text):
         pass
     
-    def process_video(self, video_path):
+    def extract_audio_from_video(self, video_path):
+        """模拟提取音频，生成1秒静音文件"""
+        temp_audio = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        temp_audio.close()
+        audio_utils.write_wav([b'\x00' * audio_utils.seconds_to_bytes(1)], temp_audio.name)
+        return temp_audio.name
+    
+    def transcribe_audio(self, audio_path, job=None, keep_audio=False):
+        """模拟转写音频文件"""
+        if not keep_audio and os.path.exists(audio_path):
+            os.unlink(audio_path)
+        return self.process_video(audio_path)
+    
+    def process_video(self, video_path, job=None, progress_callback=None):
         """模拟处理视频文件"""
+        text = self._mock_text()
+        if progress_callback is not None:
+            # 按行模拟分块转写的进度
+            lines = text.splitlines(keepends=True)
+            for i, line in enumerate(lines):
+                progress_callback(line, i + 1, len(lines))
+        return text
+    
+    def _mock_text(self):
         # 返回模拟的转换结果
         return """
         欢迎来到技能操作培训课程。今天我们将学习如何正确使用这个设备。
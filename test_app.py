@@ -53,6 +53,30 @@ def test_imports():
     
     return True
 
+def test_settings_defaults():
+    """测试可选配置项的默认值与配置示例一致"""
+    print("\n测试配置默认值...")
+    
+    try:
+        import config_example
+        import settings
+        
+        # JOB_DIR与DEFAULT_TEMPLATE的默认值由使用处另行确定
+        mismatched = [name for name, value in settings.DEFAULTS.items()
+                      if name not in ('JOB_DIR', 'DEFAULT_TEMPLATE')
+                      and getattr(config_example, name, None) != value]
+        
+        if not mismatched:
+            print("✓ 配置默认值与配置示例一致")
+            return True
+        else:
+            print(f"✗ 配置默认值与配置示例不一致: {mismatched}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 配置默认值测试失败: {e}")
+        return False
+
 def test_speech_to_text():
     """测试语音转文字功能"""
     print("\n测试语音转文字功能...")
@@ -162,6 +186,1189 @@ def test_document_processor():
         print(f"✗ 文档处理功能测试失败: {e}")
         return False
 
+def test_chunk_stitching():
+    """测试分块文本拼接"""
+    print("\n测试分块文本拼接...")
+    
+    try:
+        from text_processor import stitch_texts
+        
+        chunks = [
+            "欢迎来到技能操作培训课程。今天我们将学习如何正确",
+            "我们将学习如何正确使用这个设备。首先打开电源开关，",
+            "首先打开电源开关，然后检查设备状态指示灯。"
+        ]
+        result = stitch_texts(chunks)
+        expected = "欢迎来到技能操作培训课程。今天我们将学习如何正确使用这个设备。首先打开电源开关，然后检查设备状态指示灯。"
+        
+        if result == expected:
+            print("✓ 分块文本拼接正常")
+            return True
+        else:
+            print(f"✗ 分块文本拼接异常: {result}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 分块文本拼接测试失败: {e}")
+        return False
+
+def test_chunk_failure():
+    """测试分块转写失败时取消其余分块"""
+    print("\n测试分块转写失败...")
+    
+    import time
+    import config
+    saved = config.TRANSCRIBE_WORKERS
+    try:
+        from speech_to_text import SpeechToText
+        
+        config.TRANSCRIBE_WORKERS = 2
+        speech = SpeechToText()
+        calls = []
+        
+        def transcribe(chunk, job=None):
+            calls.append(chunk['start'])
+            if chunk['start'] == 0:
+                raise Exception("上传失败")
+            time.sleep(0.2)
+            return '文字。'
+        
+        speech._transcribe_chunk = transcribe
+        chunks = [{'start': float(i), 'end': i + 1.0, 'pcm': b'', 'overlap': False, 'segments': []}
+                  for i in range(10)]
+        start = time.perf_counter()
+        try:
+            speech.transcribe_chunks(chunks)
+            failed = False
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - start
+        
+        # 第一个分块失败后立即返回，排队中的分块不再上传
+        if failed and elapsed < 0.3 and len(calls) <= 3:
+            print("✓ 分块转写失败处理正常")
+            return True
+        else:
+            print(f"✗ 分块转写失败处理异常: {failed} {elapsed:.2f}s {calls}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 分块转写失败测试失败: {e}")
+        return False
+    finally:
+        config.TRANSCRIBE_WORKERS = saved
+
+def test_voice_activity_detection():
+    """测试语音活动检测"""
+    print("\n测试语音活动检测...")
+    
+    try:
+        import numpy as np
+        import audio_utils
+        import vad
+        
+        # 构造 静音5秒 + 有声10秒 + 静音20秒 的测试音频
+        sample_rate = 16000
+        tone = 8000 * np.sin(np.arange(10 * sample_rate) * 2 * np.pi * 300 / sample_rate)
+        samples = np.concatenate([
+            np.zeros(5 * sample_rate), tone, np.zeros(20 * sample_rate)
+        ]).astype('<i2')
+        
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            wav_path = f.name
+        audio_utils.write_wav([samples.tobytes()], wav_path, sample_rate, 1)
+        
+        data, rate = vad.read_wav_samples(wav_path)
+        regions = vad.detect_speech_regions(data, rate)
+        chunks = list(vad.iter_speech_chunks(data, regions, rate, 120))
+        del data
+        
+        # 转写失败时也应关闭内存映射，否则Windows上无法删除临时文件
+        from speech_to_text import SpeechToText
+        speech = SpeechToText()
+        opened = []
+        read_wav_samples = vad.read_wav_samples
+        
+        def read_and_record(path):
+            result = read_wav_samples(path)
+            opened.append(result[0].base)
+            return result
+        
+        def fail(chunk, job=None):
+            raise Exception("上传失败")
+        
+        speech._transcribe_chunk = fail
+        vad.read_wav_samples = read_and_record
+        try:
+            speech.transcribe_speech_regions(wav_path)
+        except Exception:
+            pass
+        finally:
+            vad.read_wav_samples = read_wav_samples
+        mapping_closed = bool(opened) and opened[0]._mmap.closed
+        os.unlink(wav_path)
+        
+        if (len(regions) == 1 and abs(regions[0][0] / rate - 5) < 0.5
+                and abs(vad.to_original_time(chunks[0], 1.0) - (regions[0][0] / rate + 1.0)) < 1e-6
+                and mapping_closed):
+            print("✓ 语音活动检测正常")
+            print(f"  语音区域: {regions[0][0] / rate:.2f}s - {regions[0][1] / rate:.2f}s")
+            return True
+        else:
+            print(f"✗ 语音活动检测异常: {regions} 映射已关闭={mapping_closed}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 语音活动检测测试失败: {e}")
+        return False
+
+def test_streaming_upload_memory():
+    """测试流式上传的内存占用"""
+    print("\n测试流式上传内存占用...")
+    
+    try:
+        import tracemalloc
+        import wave
+        from multipart import MultipartStream
+        
+        # 生成1小时16kHz单声道WAV文件（稀疏文件，不实际占用磁盘）
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as f:
+            wav_path = f.name
+        with wave.open(wav_path, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(16000)
+        data_size = 3600 * 16000 * 2
+        with open(wav_path, 'r+b') as f:
+            f.truncate(44 + data_size)
+        
+        tracemalloc.start()
+        body = MultipartStream({'model': 'deepseek-whisper'}, 'file', 'audio.wav',
+                               'audio/wav', path=wav_path)
+        total = 0
+        for block in body:
+            total += len(block)
+        body.close()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.unlink(wav_path)
+        
+        if total == len(body) and peak < 2 * 1024 * 1024:
+            print("✓ 流式上传内存占用正常")
+            print(f"  请求体大小: {total / 1024 / 1024:.1f} MB, 峰值内存: {peak / 1024:.1f} KB")
+            return True
+        else:
+            print(f"✗ 流式上传内存占用异常: 请求体 {total} 字节, 峰值内存 {peak} 字节")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 流式上传内存占用测试失败: {e}")
+        return False
+
+def test_http_client_retry():
+    """测试API客户端的重试与连接复用"""
+    print("\n测试API客户端重试...")
+    
+    try:
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from http_client import ApiClient
+        
+        state = {'count': 0}
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                state['count'] += 1
+                # 前两次返回503，之后返回成功
+                status = 503 if state['count'] <= 2 else 200
+                body = json.dumps({'ok': status == 200}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        
+        client = ApiClient(api_base=f'http://127.0.0.1:{server.server_port}', api_key='test')
+        client.backoff_base = 0.01
+        response = client.post('/v1/chat/completions', json={})
+        metrics = client.get_metrics()
+        client.close()
+        server.shutdown()
+        server.server_close()
+        
+        if (response.status_code == 200 and metrics['retries'] == 2
+                and metrics['connections_reused'] >= 1):
+            print("✓ API客户端重试正常")
+            print(f"  重试次数: {metrics['retries']}, 复用连接: {metrics['connections_reused']}")
+            return True
+        else:
+            print(f"✗ API客户端重试异常: {response.status_code} {metrics}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ API客户端重试测试失败: {e}")
+        return False
+
+def test_job_checkpoints():
+    """测试任务检查点续跑"""
+    print("\n测试任务检查点...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from job_store import JobStore
+        from text_processor import TextProcessor
+        
+        video_path = os.path.join(temp_dir, 'video.mp4')
+        with open(video_path, 'wb') as f:
+            f.write(b'video')
+        
+        store = JobStore(os.path.join(temp_dir, 'jobs'))
+        job = store.open_job(video_path)
+        job.save_chunk({'start': 0.0, 'end': 120.0}, '第一段')
+        job.save_text('optimized', '优化后的文本。')
+        
+        # 重新打开同一视频的任务，已完成的阶段不再调用API
+        processor = TextProcessor()
+        calls = []
+        processor.request_optimization = lambda text, context=None: calls.append(text) or text
+        job = store.open_job(video_path)
+        result = processor.process_text('原始文本。', job)
+        reused = (not calls and job.load_chunk({'start': 0.0, 'end': 120.0}) == '第一段'
+                  and job.completed('structured'))
+        
+        # 提示词版本变化后，已保存的优化文本与结构化内容失效，重新优化
+        import text_processor
+        from cache import hash_file
+        prompt_version = text_processor.OPTIMIZE_PROMPT_VERSION
+        text_processor.OPTIMIZE_PROMPT_VERSION = prompt_version + 1
+        try:
+            rerun = processor.process_text('原始文本。', store.open_job(video_path))
+        finally:
+            text_processor.OPTIMIZE_PROMPT_VERSION = prompt_version
+        
+        # 导出后删除任务目录
+        job_dir = job.job_dir
+        store.remove_job(job)
+        
+        if (reused and result['sections'][0]['content'] == ['优化后的文本。']
+                and calls == ['原始文本。']
+                and rerun['sections'][0]['content'] == ['原始文本。']
+                and job.content_hash == hash_file(video_path)
+                and not os.path.exists(job_dir)):
+            print("✓ 任务检查点正常")
+            return True
+        else:
+            print(f"✗ 任务检查点异常: {result} {rerun} {calls}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 任务检查点测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_mock_server():
+    """测试本地模拟API服务"""
+    print("\n测试模拟API服务...")
+    
+    try:
+        from mock_server import MockApiServer
+        from http_client import ApiClient
+        from speech_to_text import SpeechToText
+        from text_processor import TextProcessor
+        
+        # 真实的语音识别与文本处理通过HTTP访问模拟服务
+        with MockApiServer(latency='uniform:0.01,0.02') as server:
+            client = ApiClient(api_base=server.url, api_key='test')
+            speech = SpeechToText()
+            speech.client = client
+            processor = TextProcessor()
+            processor.llm_cache = None
+            processor.client = client
+            
+            text = speech._request_transcription(b'\x00' * 64000)
+            optimized = processor.request_optimization(text)
+            metrics = client.get_metrics()
+            client.close()
+        
+        # 429注入：重试耗尽后返回最后一次响应
+        with MockApiServer(rate_429=1.0, retry_after=0.01) as server:
+            client = ApiClient(api_base=server.url, api_key='test')
+            client.max_retries = 1
+            client.backoff_base = 0.01
+            response = client.post('/v1/chat/completions', json={})
+            limited = client.get_metrics()
+            client.close()
+            stats = server.state.snapshot()
+        
+        if (text and optimized == text and metrics['connections_reused'] >= 1
+                and response.status_code == 429 and limited['status_429'] == 2
+                and stats['status'].get('429') == 2):
+            print("✓ 模拟API服务正常")
+            print(f"  转写结果: {text[:20]}...")
+            return True
+        else:
+            print(f"✗ 模拟API服务异常: {metrics} {limited} {stats}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 模拟API服务测试失败: {e}")
+        return False
+
+def test_benchmark_baseline():
+    """测试基准结果比较"""
+    print("\n测试基准结果比较...")
+    
+    try:
+        from benchmark import BENCHMARK_STAGES, compare_results, generate_transcript
+        
+        def report(extract_seconds, rss):
+            stages = {stage: 1.0 for stage in BENCHMARK_STAGES}
+            stages['extract'] = extract_seconds
+            return {'results': {'1m': {'stages': stages, 'total_seconds': sum(stages.values()),
+                                       'peak_rss_mb': rss}}}
+        
+        rows, regressions = compare_results(report(2.0, 100.0), report(1.0, 100.0), threshold=0.1)
+        regressed = [(size, name) for size, name, _, _, _ in regressions]
+        transcript = generate_transcript(60)
+        
+        if (('1m', 'extract_seconds') in regressed and ('1m', 'peak_rss_mb') not in regressed
+                and len(rows) == len(BENCHMARK_STAGES) + 2 and len(transcript) >= 240):
+            print("✓ 基准结果比较正常")
+            return True
+        else:
+            print(f"✗ 基准结果比较异常: {regressions}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 基准结果比较测试失败: {e}")
+        return False
+
+def test_instrumentation():
+    """测试阶段跟踪与指标导出"""
+    print("\n测试阶段跟踪...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import json
+        import instrumentation
+        from benchmark import generate_speech_like_audio
+        from mock_server import MockApiServer
+        from http_client import ApiClient
+        from speech_to_text import SpeechToText
+        from text_processor import TextProcessor
+        
+        tracer = instrumentation.get_tracer()
+        tracer.reset()
+        audio_path = generate_speech_like_audio(os.path.join(temp_dir, 'audio.wav'), 20)
+        
+        with MockApiServer() as server:
+            client = ApiClient(api_base=server.url, api_key='test')
+            speech = SpeechToText()
+            speech.client = client
+            speech.cache = None
+            processor = TextProcessor()
+            processor.llm_cache = None
+            processor.client = client
+            
+            text = speech.convert_audio_to_text_chunked(audio_path)
+            processor.analyze_structure(processor.optimize_text(text))
+            client.close()
+        
+        trace_path = tracer.export_json(os.path.join(temp_dir, 'trace.json'))
+        metrics_path = tracer.export_prometheus(os.path.join(temp_dir, 'metrics.prom'))
+        with open(trace_path, 'r', encoding='utf-8') as f:
+            events = {event['name']: event['args'] for event in json.load(f)['traceEvents']}
+        with open(metrics_path, 'r', encoding='utf-8') as f:
+            metrics = f.read()
+        
+        # 分块转写在线程池中发出的API请求也计入转写区间
+        transcribe = events.get('convert_audio_to_text_chunked', {})
+        if (transcribe.get('api_calls', 0) >= 1 and transcribe.get('bytes_in', 0) > 0
+                and events.get('optimize_text', {}).get('bytes_out', 0) > 0
+                and 'analyze_structure' in events
+                and 'video2script_stage_seconds_total{stage="optimize_text"}' in metrics
+                and 'video2script_api_latency_seconds_count{endpoint="/v1/chat/completions"} 1' in metrics):
+            print("✓ 阶段跟踪正常")
+            print(f"  转写API请求: {transcribe['api_calls']} 次")
+            return True
+        else:
+            print(f"✗ 阶段跟踪异常: {events}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 阶段跟踪测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_lazy_imports():
+    """测试启动时不导入重型依赖"""
+    print("\n测试延迟导入...")
+    
+    try:
+        import subprocess
+        
+        # 在新进程中导入界面模块，检查重型库是否已被加载
+        code = ("import sys, gui_simple; "
+                "print(','.join(m for m in ('moviepy', 'docx', 'numpy', 'pydub') if m in sys.modules))")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        loaded = result.stdout.strip()
+        
+        if result.returncode == 0 and not loaded:
+            print("✓ 启动时未导入重型依赖")
+            return True
+        else:
+            print(f"✗ 启动时导入了: {loaded or result.stderr}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 延迟导入测试失败: {e}")
+        return False
+
+def test_audio_input():
+    """测试音频文件直接输入"""
+    print("\n测试音频文件输入...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import config
+        import audio_utils
+        from benchmark import generate_speech_like_audio
+        from speech_to_text import SpeechToText
+        
+        speech = SpeechToText()
+        speech.cache = None
+        speech._request_transcription = lambda audio, filename='audio.wav', mime_type='audio/wav': '测试文字。'
+        
+        # 16kHz单声道PCM WAV直接转写，不提取也不删除原文件
+        wav_path = generate_speech_like_audio(os.path.join(temp_dir, 'speech.wav'), 10)
+        extracted = []
+        original_extract = speech.extract_audio_from_video
+        speech.extract_audio_from_video = lambda path: extracted.append(path) or original_extract(path)
+        text = speech.process_video(wav_path)
+        passthrough = text and not extracted and os.path.exists(wav_path)
+        
+        # 其他格式的音频经过一次重采样
+        stereo_path = os.path.join(temp_dir, 'stereo.wav')
+        audio_utils.write_wav([b'\x00' * 44100 * 4 * 10], stereo_path, 44100, 2)
+        resampled = original_extract(stereo_path)
+        converted = (not audio_utils.is_pipeline_wav(stereo_path)
+                     and audio_utils.is_pipeline_wav(resampled))
+        os.unlink(resampled)
+        
+        # 指定任务且关闭语音活动检测时，已提取的音频按WAV文件头中的总时长报告进度
+        from job_store import JobStore
+        saved = (config.VAD_ENABLED, config.TRANSCRIBE_CHUNK_SECONDS)
+        config.VAD_ENABLED, config.TRANSCRIBE_CHUNK_SECONDS = False, 4
+        try:
+            job = JobStore(os.path.join(temp_dir, 'jobs')).open_job(stereo_path)
+            job.save_audio(original_extract(stereo_path))
+            progress = []
+            speech.process_video(stereo_path, job,
+                                 progress_callback=lambda text, done, total: progress.append((done, total)))
+            
+            # 未提取音频时边解码边转写，分块检查点与音频文件的分块一致，重新处理时跳过已完成的分块
+            job.invalidate('raw')
+            calls = []
+            speech._request_transcription = lambda audio, filename='audio.wav', mime_type='audio/wav': calls.append(1) or '测试文字。'
+            resumed = speech.process_video(stereo_path, job)
+        finally:
+            config.VAD_ENABLED, config.TRANSCRIBE_CHUNK_SECONDS = saved
+        reported = (len(progress) >= 3 and all(abs(total - 10.0) < 0.01 for _, total in progress)
+                    and progress[0][0] < progress[-1][0] == progress[-1][1])
+        streamed = bool(resumed) and not calls and not extracted and job.load_text('raw') == resumed
+        
+        if passthrough and converted and reported and streamed:
+            print("✓ 音频文件输入正常")
+            return True
+        else:
+            print(f"✗ 音频文件输入异常: 直接使用={passthrough}, 重采样={converted}, 进度={progress}, 流式续跑={streamed}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 音频文件输入测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_parallel_extraction():
+    """测试分段并行音频提取"""
+    print("\n测试并行音频提取...")
+    
+    import config
+    import settings
+    temp_dir = tempfile.mkdtemp()
+    saved = (config.AUDIO_EXTRACT_MODE, settings.get('AUDIO_PARALLEL_MIN_SECONDS'))
+    try:
+        import audio_utils
+        from benchmark import generate_speech_like_audio
+        from speech_to_text import SpeechToText
+        
+        source = generate_speech_like_audio(os.path.join(temp_dir, 'source.wav'), 33)
+        config.AUDIO_PARALLEL_MIN_SECONDS = 5
+        
+        # 各段按采样对齐拼接，结果与单进程解码完全一致
+        serial = b''.join(audio_utils.stream_pcm(source))
+        parallel = b''.join(audio_utils.stream_pcm_parallel(source, workers=4))
+        
+        config.AUDIO_EXTRACT_MODE = 'parallel'
+        audio_path = SpeechToText().extract_audio_from_video(source)
+        _, _, size = audio_utils.read_wav_header(audio_path)
+        os.unlink(audio_path)
+        
+        if parallel == serial and size == len(serial):
+            print("✓ 并行音频提取正常")
+            return True
+        else:
+            print(f"✗ 并行音频提取异常: {len(serial)} / {len(parallel)} / {size}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 并行音频提取测试失败: {e}")
+        return False
+    finally:
+        config.AUDIO_EXTRACT_MODE, config.AUDIO_PARALLEL_MIN_SECONDS = saved
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_video_pipeline():
+    """测试多视频流水线"""
+    print("\n测试多视频流水线...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import time
+        import threading
+        import audio_utils
+        from pipeline import VideoPipeline
+        
+        events = []
+        lock = threading.Lock()
+        
+        def record(stage, path, start):
+            with lock:
+                events.append((stage, os.path.basename(path), start, time.perf_counter()))
+        
+        class FakeSpeech:
+            last_chunks = []
+            
+            def lookup_cache(self, video_path, content_hash=None):
+                return None, None
+            
+            def store_cache(self, cache_key, text):
+                pass
+            
+            def extract_audio_from_video(self, video_path):
+                start = time.perf_counter()
+                time.sleep(0.02)
+                if os.path.basename(video_path) == 'bad.mp4':
+                    raise Exception("无法解码")
+                audio_path = tempfile.mktemp(suffix='.wav', dir=temp_dir)
+                audio_utils.write_wav([b'\x00' * audio_utils.seconds_to_bytes(1)], audio_path)
+                record('extract', video_path, start)
+                return audio_path
+            
+            def transcribe_audio(self, audio_path, job=None, keep_audio=False):
+                start = time.perf_counter()
+                time.sleep(0.1)
+                os.unlink(audio_path)
+                record('transcribe', audio_path, start)
+                return '转写文字。'
+        
+        class FakeTextProcessor:
+            def process_text(self, raw_text, job=None):
+                return {'title': '脚本', 'sections': [{'title': '主要内容', 'content': [raw_text]}]}
+        
+        class FakeDocumentProcessor:
+            def export_to_docx(self, structured_content, template_path=None, output_filename=None):
+                return os.path.join(temp_dir, output_filename)
+        
+        videos = [os.path.join(temp_dir, f'video{i}.mp4') for i in range(8)]
+        videos.insert(3, os.path.join(temp_dir, 'bad.mp4'))
+        for path in videos:
+            with open(path, 'wb') as f:
+                f.write(b'video')
+        
+        pipeline = VideoPipeline(FakeSpeech, FakeTextProcessor, FakeDocumentProcessor())
+        pipeline.job_store = None
+        pipeline.workers = {'extract': 2, 'transcribe': 1, 'process': 1, 'export': 1}
+        pipeline.queue_size = 1
+        jobs = pipeline.run_sync(videos)
+        
+        extracts = [event for event in events if event[0] == 'extract']
+        transcribes = [event for event in events if event[0] == 'transcribe']
+        
+        # 一个视频的语音识别与其他视频的音频提取同时进行
+        overlapped = any(e_start < t_end and t_start < e_end
+                         for _, _, t_start, t_end in transcribes for _, _, e_start, e_end in extracts)
+        # 下游队列已满时上游等待：第一次转写结束前，提取最多领先 1(转写中) + 1(队列) + 2(等待放入) 个
+        first_done = min(end for _, _, _, end in transcribes)
+        bounded = sum(1 for _, _, _, end in extracts if end < first_done) <= 4
+        # 失败的视频单独报告，不影响其他视频
+        failed = [job for job in jobs if job['error'] is not None]
+        isolated = (len(failed) == 1 and failed[0]['video_path'].endswith('bad.mp4')
+                    and failed[0]['error'].startswith('extract')
+                    and all(job['output_path'] for job in jobs if job['error'] is None)
+                    and len(extracts) == len(transcribes) == 8)
+        
+        if overlapped and bounded and isolated:
+            print("✓ 多视频流水线正常")
+            return True
+        else:
+            print(f"✗ 多视频流水线异常: {overlapped} {bounded} {isolated} {[job['error'] for job in jobs]}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 多视频流水线测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_batch_inputs():
+    """测试批量处理的输入收集与输出文件名"""
+    print("\n测试批量输入与输出文件名...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from batch import collect_videos, BatchPipeline
+        
+        videos_dir = os.path.join(temp_dir, 'videos')
+        os.makedirs(os.path.join(videos_dir, 'sub'))
+        for name in ('a.mp4', 'b.MOV', 'notes.txt', os.path.join('sub', 'a.mp4')):
+            with open(os.path.join(videos_dir, name), 'wb') as f:
+                f.write(b'video')
+        a_path = os.path.join(videos_dir, 'a.mp4')
+        b_path = os.path.join(videos_dir, 'b.MOV')
+        sub_path = os.path.join(videos_dir, 'sub', 'a.mp4')
+        
+        # 目录只收集支持的格式；递归时包含子目录
+        flat = collect_videos([videos_dir]) == [a_path, b_path]
+        recursive = collect_videos([videos_dir], recursive=True) == [a_path, b_path, sub_path]
+        # 通配符展开；同一文件多次给出（含相对路径）只处理一次
+        pattern = collect_videos([os.path.join(videos_dir, '*.mp4')]) == [a_path]
+        relative = os.path.relpath(a_path)
+        deduplicated = collect_videos([a_path, relative, videos_dir]) == [a_path, b_path]
+        
+        # 同名视频与已存在的输出文件追加序号，不覆盖
+        class FakeDocumentProcessor:
+            output_dir = os.path.join(temp_dir, 'output')
+        
+        os.makedirs(FakeDocumentProcessor.output_dir)
+        with open(os.path.join(FakeDocumentProcessor.output_dir, 'b_培训脚本.docx'), 'wb') as f:
+            f.write(b'existing')
+        pipeline = BatchPipeline(speech_factory=object, text_processor_factory=object,
+                                 document_processor=FakeDocumentProcessor())
+        names = [pipeline.output_filename({'video_path': path})
+                 for path in (a_path, sub_path, os.path.join(temp_dir, 'a.mov'), b_path)]
+        suffixed = names == ['a_培训脚本.docx', 'a_培训脚本_2.docx', 'a_培训脚本_3.docx', 'b_培训脚本_2.docx']
+        
+        if flat and recursive and pattern and deduplicated and suffixed:
+            print("✓ 批量输入与输出文件名正常")
+            return True
+        else:
+            print(f"✗ 批量输入与输出文件名异常: {flat} {recursive} {pattern} {deduplicated} {names}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 批量输入与输出文件名测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_chunked_optimization():
+    """测试分块并发文本优化"""
+    print("\n测试分块文本优化...")
+    
+    import config
+    saved = (config.MAX_TEXT_LENGTH, config.CHUNK_OVERLAP, config.OPTIMIZE_CHUNK_TOKENS)
+    try:
+        from benchmark import generate_transcript
+        from mock_server import MockApiServer
+        from http_client import ApiClient
+        from text_processor import TextProcessor, split_sentences, chunk_sentences, stitch_sentences
+        
+        config.MAX_TEXT_LENGTH = 1000
+        config.CHUNK_OVERLAP = 100
+        config.OPTIMIZE_CHUNK_TOKENS = 0
+        text = generate_transcript(2500)
+        chunks = chunk_sentences(split_sentences(text))
+        packed = (len(chunks) > 1 and ''.join(body for _, body in chunks) == text
+                  and all(len(body) <= 1000 and len(context) <= 100 for context, body in chunks))
+        
+        # 模型重复输出的上文句子在拼接时去除
+        stitched = stitch_sentences("第一句。第二句。第三句。", "第二句。第三句！第四句。")
+        
+        with MockApiServer() as server:
+            processor = TextProcessor()
+            processor.llm_cache = None
+            processor.client = ApiClient(api_base=server.url, api_key='test')
+            optimized = processor.optimize_text(text)
+            requests_sent = server.state.snapshot()['requests']
+            processor.client.close()
+        
+        if (packed and stitched == "第一句。第二句。第三句。\n第四句。"
+                and optimized.replace('\n', '') == text and requests_sent == len(chunks)):
+            print("✓ 分块文本优化正常")
+            print(f"  {len(text)} 字分为 {len(chunks)} 块")
+            return True
+        else:
+            print(f"✗ 分块文本优化异常: {packed} {stitched!r} {requests_sent}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 分块文本优化测试失败: {e}")
+        return False
+    finally:
+        config.MAX_TEXT_LENGTH, config.CHUNK_OVERLAP, config.OPTIMIZE_CHUNK_TOKENS = saved
+
+def test_llm_cache():
+    """测试模型输出缓存"""
+    print("\n测试模型输出缓存...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import time
+        from cache import LLMCache
+        from mock_server import MockApiServer, MOCK_SENTENCES
+        from http_client import ApiClient
+        from text_processor import TextProcessor
+        
+        # 过期的条目不再命中
+        cache = LLMCache(os.path.join(temp_dir, 'ttl'), 1024 * 1024, ttl_seconds=0.2)
+        cache.set('key', {'content': '内容'})
+        fresh = cache.get('key') is not None
+        time.sleep(0.3)
+        expired = cache.get('key') is None and cache.stats()['expirations'] == 1
+        
+        sentences = [MOCK_SENTENCES[i % len(MOCK_SENTENCES)][:-1] + f"{i}。" for i in range(600)]
+        text = ''.join(sentences)
+        edited = text.replace(sentences[300], "这是修改过的一句话，长度与原来不同。")
+        
+        with MockApiServer() as server:
+            processor = TextProcessor()
+            processor.client = ApiClient(api_base=server.url, api_key='test')
+            processor.llm_cache = LLMCache(os.path.join(temp_dir, 'llm'))
+            processor.optimize_text(text)
+            first = server.state.snapshot()['requests']
+            processor.optimize_text(text)
+            repeated = server.state.snapshot()['requests'] - first
+            processor.optimize_text(edited)
+            after_edit = server.state.snapshot()['requests'] - first
+            processor.client.close()
+        
+        # 相同文本不再请求；修改一句话只有所在分块重新请求
+        if fresh and expired and first > 1 and repeated == 0 and after_edit == 1:
+            print("✓ 模型输出缓存正常")
+            print(f"  首次请求 {first} 次, 修改一句后请求 {after_edit} 次")
+            return True
+        else:
+            print(f"✗ 模型输出缓存异常: {fresh} {expired} {first} {repeated} {after_edit}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 模型输出缓存测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_transcription_cache():
+    """测试转写结果缓存"""
+    print("\n测试转写结果缓存...")
+    
+    import config
+    temp_dir = tempfile.mkdtemp()
+    saved = (config.TRANSCRIBE_MODEL, config.TRANSCRIBE_LANGUAGE, config.TRANSCRIPTION_CACHE_MAX_MB,
+             config.VAD_ENABLED)
+    try:
+        import audio_utils
+        from cache import TranscriptionCache
+        from speech_to_text import SpeechToText
+        
+        # 非转写格式的音频需要先提取，第二次处理同一文件时跳过提取和语音识别
+        config.VAD_ENABLED = False
+        media_path = os.path.join(temp_dir, 'stereo.wav')
+        audio_utils.write_wav([b'\x00' * 44100 * 4 * 3], media_path, 44100, 2)
+        speech = SpeechToText()
+        speech.cache = TranscriptionCache(os.path.join(temp_dir, 'transcripts'))
+        calls = []
+        speech._request_transcription = lambda audio, filename='audio.wav', mime_type='audio/wav': calls.append(1) or '缓存测试。'
+        extracted = []
+        original_extract = speech.extract_audio_from_video
+        speech.extract_audio_from_video = lambda path: extracted.append(path) or original_extract(path)
+        original_stream = speech.stream_audio_from_video
+        speech.stream_audio_from_video = lambda path: extracted.append(path) or original_stream(path)
+        first = speech.process_video(media_path)
+        first_work = (len(calls), len(extracted))
+        second = speech.process_video(media_path)
+        reused = (first == second and first_work[0] > 0 and first_work[1] > 0
+                  and (len(calls), len(extracted)) == first_work)
+        
+        # 识别模型或语言变化后不再命中
+        key = speech.cache.key_for(media_path)
+        config.TRANSCRIBE_MODEL = 'other-model'
+        model_miss = speech.cache.key_for(media_path) != key and speech.lookup_cache(media_path)[1] is None
+        config.TRANSCRIBE_MODEL = saved[0]
+        config.TRANSCRIBE_LANGUAGE = 'en'
+        language_miss = speech.cache.key_for(media_path) != key and speech.lookup_cache(media_path)[1] is None
+        config.TRANSCRIBE_LANGUAGE = saved[1]
+        
+        # 超出TRANSCRIPTION_CACHE_MAX_MB时淘汰最久未使用的条目
+        config.TRANSCRIPTION_CACHE_MAX_MB = 1000 / (1024 * 1024)
+        cache = TranscriptionCache(os.path.join(temp_dir, 'lru'))
+        for name in ('a', 'b', 'c'):
+            cache.set(name, {'text': name * 300, 'chunks': []})
+        cache.get('a')
+        cache.set('d', {'text': 'd' * 300, 'chunks': []})
+        evicted = (cache.get('b') is None and all(cache.get(name) is not None for name in ('a', 'c', 'd'))
+                   and cache.stats()['bytes'] <= 1000)
+        
+        if reused and model_miss and language_miss and evicted:
+            print("✓ 转写结果缓存正常")
+            return True
+        else:
+            print(f"✗ 转写结果缓存异常: {reused} {first_work} {calls} {model_miss} {language_miss} {evicted}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 转写结果缓存测试失败: {e}")
+        return False
+    finally:
+        (config.TRANSCRIBE_MODEL, config.TRANSCRIBE_LANGUAGE, config.TRANSCRIPTION_CACHE_MAX_MB,
+         config.VAD_ENABLED) = saved
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_streaming_optimization():
+    """测试流式文本优化"""
+    print("\n测试流式文本优化...")
+    
+    import time
+    import config
+    saved = (config.MAX_TEXT_LENGTH, config.OPTIMIZE_CHUNK_TOKENS)
+    try:
+        from benchmark import generate_transcript
+        from mock_server import MockApiServer
+        from http_client import ApiClient
+        from text_processor import TextProcessor
+        
+        config.MAX_TEXT_LENGTH = 1000
+        config.OPTIMIZE_CHUNK_TOKENS = 0
+        text = generate_transcript(600)
+        
+        with MockApiServer(token_delay=0.005) as server:
+            processor = TextProcessor()
+            processor.llm_cache = None
+            processor.client = ApiClient(api_base=server.url, api_key='test')
+            
+            deltas = []
+            first_delta = []
+            start = time.perf_counter()
+            
+            def on_delta(delta):
+                if not first_delta:
+                    first_delta.append(time.perf_counter() - start)
+                deltas.append(delta)
+            
+            optimized = processor.optimize_text(text, on_delta)
+            total = time.perf_counter() - start
+            processor.client.close()
+        
+        # 模型输出首尾带空白时，流式拼接结果与非流式相同
+        def pieces(body):
+            return ['\n ', body[:7], ' \n', body[7:], '\n\n ']
+        
+        def stream(body, context=None):
+            yield from pieces(body)
+        
+        processor.stream_optimization = stream
+        processor.request_optimization = lambda body, context=None: ''.join(pieces(body))
+        streamed = ''.join(processor.optimize_text_stream(text))
+        
+        # 首段文字在整体生成完成前就已输出，拼接结果与非流式一致
+        if (len(deltas) > 10 and first_delta and first_delta[0] < total / 4
+                and ''.join(deltas) == optimized and optimized.replace('\n', '') == text
+                and streamed == processor.optimize_chunked(text)):
+            print("✓ 流式文本优化正常")
+            print(f"  首段文字 {first_delta[0]:.2f}s, 全部完成 {total:.2f}s, 共 {len(deltas)} 段")
+            return True
+        else:
+            print(f"✗ 流式文本优化异常: {len(deltas)} {first_delta} {total:.2f}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 流式文本优化测试失败: {e}")
+        return False
+    finally:
+        config.MAX_TEXT_LENGTH, config.OPTIMIZE_CHUNK_TOKENS = saved
+
+def test_streaming_segmenter():
+    """测试流式分段"""
+    print("\n测试流式分段...")
+    
+    try:
+        from benchmark import generate_transcript
+        from text_processor import iter_sentences, segment_stream
+        
+        text = (generate_transcript(2000) + "有句号但超过上限的长句子，" * 40 + "。"
+                + "Step one. Step two? " + "没有标点的超长句子" * 100)
+        whole = list(segment_stream([text], 300))
+        pieces = list(segment_stream([text[i:i + 7] for i in range(0, len(text), 7)], 300))
+        overlapped = list(segment_stream([text], 300, overlap=60))
+        
+        # 超长句子无论句末标点何时到达，都按相同位置切开
+        sentences = list(iter_sentences([text], 300))
+        split_long = (sentences == list(iter_sentences([text[i:i + 7] for i in range(0, len(text), 7)], 300))
+                      and all(len(sentence) <= 300 for sentence in sentences))
+        
+        # 逐段输入与整段输入结果一致，分段不超过上限且首尾相接还原原文
+        bounded = all(len(segment) <= 300 for segment in whole + overlapped)
+        restored = ''.join(whole).replace(' ', '') == text.replace(' ', '')
+        ascii_split = any(segment.endswith("Step two?") for segment in whole)
+        repeated = all(any(after.startswith(before[-n:]) for n in range(5, 61))
+                       for before, after in zip(overlapped, overlapped[1:5]))
+        
+        if whole == pieces and bounded and restored and ascii_split and repeated and split_long:
+            print("✓ 流式分段正常")
+            print(f"  {len(text)} 字分为 {len(whole)} 段")
+            return True
+        else:
+            print(f"✗ 流式分段异常: {whole == pieces} {bounded} {restored} {ascii_split} {repeated} {split_long}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 流式分段测试失败: {e}")
+        return False
+
+def test_keyword_index():
+    """测试章节关键词索引"""
+    print("\n测试章节关键词索引...")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import json
+        import config
+        import settings
+        from keyword_index import KeywordIndex, get_keyword_index
+        from text_processor import TextProcessor
+        
+        index = KeywordIndex(['步骤', '操作步骤', '注意事项'])
+        # 取起始位置最早的关键词，起点相同时取最长的，且须完整出现在窗口内
+        earliest = (index.find("请注意事项与操作步骤") == (1, '注意事项')
+                    and index.find("按操作步骤") == (1, '操作步骤')
+                    and index.find("按操作步骤", 4) is None)
+        
+        keywords_file = os.path.join(temp_dir, 'keywords.json')
+        with open(keywords_file, 'w', encoding='utf-8') as f:
+            json.dump({'sections': ['故障排除']}, f, ensure_ascii=False)
+        cached = get_keyword_index(keywords_file) is get_keyword_index(keywords_file)
+        loaded = get_keyword_index(keywords_file).find("六、故障排除方法") == (2, '故障排除')
+        
+        saved = (settings.get('SECTION_KEYWORDS_FILE'), config.MAX_TEXT_LENGTH)
+        config.SECTION_KEYWORDS_FILE = keywords_file
+        config.MAX_TEXT_LENGTH = 20
+        try:
+            structured = TextProcessor().analyze_structure(
+                "设备已经就绪。" * 5 + "故障排除时先断开电源。" + "检查线路。" * 5)
+        finally:
+            config.SECTION_KEYWORDS_FILE, config.MAX_TEXT_LENGTH = saved
+        titles = [section['title'] for section in structured['sections']]
+        
+        if earliest and cached and loaded and titles == ['主要内容', '故障排除']:
+            print("✓ 章节关键词索引正常")
+            return True
+        else:
+            print(f"✗ 章节关键词索引异常: {earliest} {cached} {loaded} {titles}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 章节关键词索引测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_token_estimator():
+    """测试token估计与按token分块"""
+    print("\n测试token估计...")
+    
+    try:
+        import config
+        from benchmark import generate_transcript
+        from token_estimator import estimate_tokens
+        from text_processor import split_sentences, chunk_sentences, chunk_for_optimization
+        
+        # 中文约每字0.6个token，英文约每字符0.3个token
+        estimated = (estimate_tokens("培训" * 50) == 60 and estimate_tokens("a" * 100) == 30
+                     and estimate_tokens("") == 0)
+        
+        text = generate_transcript(5000) + "Check the valve pressure before start. " * 200
+        chunks = chunk_for_optimization(text)
+        budget = min(config.OPTIMIZE_CHUNK_TOKENS, config.OPTIMIZE_MAX_TOKENS)
+        bounded = all(estimate_tokens(body) <= budget for _, body in chunks)
+        restored = ''.join(body for _, body in chunks) == text
+        by_chars = chunk_sentences(split_sentences(text))
+        
+        # 按token打包后请求次数少于按字数分块
+        if estimated and bounded and restored and len(chunks) < len(by_chars):
+            print("✓ token估计正常")
+            print(f"  {len(text)} 字约 {estimate_tokens(text)} token, 分为 {len(chunks)} 块（按字数分为 {len(by_chars)} 块）")
+            return True
+        else:
+            print(f"✗ token估计异常: {estimated} {bounded} {restored} {len(chunks)} {len(by_chars)}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ token估计测试失败: {e}")
+        return False
+
+def test_incremental_reprocess():
+    """测试修改原文后增量重新处理"""
+    print("\n测试增量重新处理...")
+    
+    import config
+    saved = config.OPTIMIZE_CHUNK_TOKENS
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from mock_server import MockApiServer, MOCK_SENTENCES
+        from http_client import ApiClient
+        from job_store import JobStore
+        from text_processor import TextProcessor
+        
+        video_path = os.path.join(temp_dir, 'video.mp4')
+        with open(video_path, 'wb') as f:
+            f.write(b'video')
+        config.OPTIMIZE_CHUNK_TOKENS = 300
+        sentences = [MOCK_SENTENCES[i % len(MOCK_SENTENCES)][:-1] + f"{i}。" for i in range(300)]
+        text = ''.join(sentences)
+        edited = text.replace(sentences[150], "这是修改过的一句话，长度与原来不同。")
+        
+        with MockApiServer() as server:
+            processor = TextProcessor()
+            processor.llm_cache = None
+            processor.client = ApiClient(api_base=server.url, api_key='test')
+            processor.process_text(text)
+            first = server.state.snapshot()['requests']
+            reprocessed = processor.reprocess_text(edited)
+            after_edit = server.state.snapshot()['requests'] - first
+            
+            # 与完整重新处理的结果一致
+            processor.last_chunks = None
+            expected = processor.process_text(edited)
+            
+            # 从保存的优化文本续跑时同样按分块分析，结果与未中断时一致
+            store = JobStore(os.path.join(temp_dir, 'jobs'))
+            job = store.open_job(video_path)
+            uninterrupted = processor.process_text(text, job)
+            job.invalidate('structured')
+            resumed_requests = server.state.snapshot()['requests']
+            resumer = TextProcessor()
+            resumer.llm_cache = None
+            resumer.client = processor.client
+            resumed = resumer.process_text(text, store.open_job(video_path))
+            resumed_requests = server.state.snapshot()['requests'] - resumed_requests
+            processor.client.close()
+        
+        # 只有修改所在的分块（内容决定的边界变化时至多相邻一块）重新请求
+        if (first > 5 and 1 <= after_edit <= 2 and reprocessed == expected
+                and resumed == uninterrupted and resumed_requests == 0):
+            print("✓ 增量重新处理正常")
+            print(f"  首次请求 {first} 次, 修改一句后请求 {after_edit} 次")
+            return True
+        else:
+            print(f"✗ 增量重新处理异常: {first} {after_edit} {reprocessed == expected} {resumed == uninterrupted}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ 增量重新处理测试失败: {e}")
+        return False
+    finally:
+        config.OPTIMIZE_CHUNK_TOKENS = saved
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_rate_limiter():
+    """测试API限流调度"""
+    print("\n测试API限流调度...")
+    
+    try:
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from rate_limiter import RateLimiter, TokenBucket
+        from mock_server import MockApiServer
+        from http_client import ApiClient
+        
+        # 令牌桶：容量用完后按速率排队
+        bucket = TokenBucket(600, burst_seconds=0.1)
+        waits = [bucket.reserve(1) for _ in range(3)]
+        queued = waits[0] == 0 and 0.05 < waits[1] < 0.15 and 0.15 < waits[2] < 0.25
+        
+        # 同一批并发请求同时收到429时只减半一次，成功后逐步增加
+        limiter = RateLimiter(concurrency=8)
+        permits = [limiter.acquire('/v1/chat/completions') for _ in range(8)]
+        for permit in permits:
+            limiter.release(permit, 429, retry_after=0.01)
+        halved = limiter.snapshot()['endpoints']['/v1/chat/completions']['concurrency_limit'] == 4
+        for _ in range(10):
+            limiter.release(limiter.acquire('/v1/chat/completions'), 200)
+        increased = limiter.snapshot()['endpoints']['/v1/chat/completions']['concurrency_limit'] > 4
+        
+        # 耗时持续升高（10ms升至40ms）时，基线随之上移，并发上限先下降后恢复
+        limiter = RateLimiter(concurrency=4)
+        step_limits = []
+        for latency in [0.01] * 6 + [0.04] * 40:
+            permit = limiter.acquire('/v1/audio/transcriptions')
+            time.sleep(latency)
+            limiter.release(permit, 200)
+            step_limits.append(limiter.snapshot()['endpoints']['/v1/audio/transcriptions']['concurrency_limit'])
+        recovered = min(step_limits) < 4 and step_limits[-1] >= 4
+        
+        # 规模不同的请求耗时按规模折算，大分块、小分块与流式响应的生成时间都不视为拥塞
+        limiter = RateLimiter(concurrency=4)
+        for size in [500] * 6 + [6000, 200, 8000, 300, 6000, 100] * 3:
+            limiter.release(limiter.acquire('/v1/chat/completions', size), 200, latency=0.5 + size * 0.002)
+        for latency in [0.2] * 6 + [0.3, 0.2]:
+            limiter.release(limiter.acquire('/v1/chat/completions', 500), 200, latency=latency, streamed=True)
+        mixed = limiter.snapshot()
+        steady = (mixed['stats']['decreases'] == 0
+                  and mixed['endpoints']['/v1/chat/completions']['concurrency_limit'] > 4)
+        
+        # 模拟服务随机返回429，并发上限自动下调，全部请求最终完成
+        with MockApiServer(rate_429=0.3, retry_after=0.02) as server:
+            client = ApiClient(api_base=server.url, api_key='test')
+            client.max_retries = 20
+            client.backoff_base = 0.01
+            payload = {'messages': [{'role': 'user', 'content': '原文：测试。要求：'}], 'max_tokens': 100}
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                statuses = list(executor.map(
+                    lambda _: client.post('/v1/chat/completions', json=payload).status_code, range(40)))
+            limits = client.get_metrics()['rate_limits']
+            description = client.rate_limiter.describe()
+            stats = server.state.snapshot()
+            client.close()
+        
+        adapted = (all(status == 200 for status in statuses) and limits['stats']['decreases'] >= 1
+                   and stats['max_in_flight'] <= 4 and '/v1/chat/completions' in description)
+        
+        if queued and halved and increased and recovered and steady and adapted:
+            print("✓ API限流调度正常")
+            print(f"  {description}")
+            return True
+        else:
+            print(f"✗ API限流调度异常: {waits} {halved} {increased} {step_limits} {mixed} {statuses} {limits} {stats['max_in_flight']}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ API限流调度测试失败: {e}")
+        return False
+
 def test_gui_creation():
     """测试GUI创建"""
     print("\n测试GUI创建...")
@@ -195,9 +1402,33 @@ def main():
     
     tests = [
         ("模块导入", test_imports),
+        ("配置默认值", test_settings_defaults),
         ("语音转文字", test_speech_to_text),
         ("文本处理", test_text_processor),
         ("文档处理", test_document_processor),
+        ("分块拼接", test_chunk_stitching),
+        ("分块转写失败", test_chunk_failure),
+        ("语音检测", test_voice_activity_detection),
+        ("流式上传", test_streaming_upload_memory),
+        ("API重试", test_http_client_retry),
+        ("任务检查点", test_job_checkpoints),
+        ("模拟API服务", test_mock_server),
+        ("基准比较", test_benchmark_baseline),
+        ("阶段跟踪", test_instrumentation),
+        ("延迟导入", test_lazy_imports),
+        ("音频输入", test_audio_input),
+        ("并行提取", test_parallel_extraction),
+        ("多视频流水线", test_video_pipeline),
+        ("批量输入", test_batch_inputs),
+        ("分块优化", test_chunked_optimization),
+        ("模型输出缓存", test_llm_cache),
+        ("转写结果缓存", test_transcription_cache),
+        ("流式文本优化", test_streaming_optimization),
+        ("流式分段", test_streaming_segmenter),
+        ("章节关键词索引", test_keyword_index),
+        ("token估计", test_token_estimator),
+        ("增量重新处理", test_incremental_reprocess),
+        ("API限流调度", test_rate_limiter),
         ("GUI创建", test_gui_creation),
     ]
     
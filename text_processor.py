@@ -1,100 +1,539 @@
 import re
-import requests
+import zlib
+import difflib
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import config
+import settings
+import instrumentation
+from http_client import get_shared_client
+from cache import LLMCache, make_key
+from keyword_index import get_keyword_index
+from token_estimator import estimate_tokens, CJK_TOKENS_PER_CHAR
+
+SENTENCE_PATTERN = re.compile(r'[^。！？!?；;\n]*(?:[。！？!?；;\n]+|$)')
+PUNCTUATION_PATTERN = re.compile(r'[\s。！？!?；;，,、：:]')
+
+# 流式分段使用的句末标点：中英文句号、问号、感叹号、分号与换行；英文句点后须跟空白，避免切开小数
+SEGMENT_BOUNDARY = re.compile(r'[。！？!?；;\n]+|\.+(?=\s)')
+SEGMENT_TERMINATORS = '。！？!?；;\n.'
+# 超长句子优先在逗号、顿号、冒号或空白处切开
+SOFT_BREAK_PATTERN = re.compile(r'[，,、：:\s]')
+
+# 文本优化提示词的版本，修改提示词或请求参数时需递增，使旧的缓存结果失效
+OPTIMIZE_PROMPT_VERSION = 1
+OPTIMIZE_MODEL = 'deepseek-chat'
+OPTIMIZE_TEMPERATURE = 0.3
+
+# 估计的平均句长，用于确定按内容切分分块的概率
+AVERAGE_SENTENCE_LENGTH = 25
+
+def merge_overlap(left, right, max_overlap=None, min_match=4):
+    """拼接相邻分块的文本，去除分块边界处重复的内容"""
+    if not left:
+        return right
+    if not right:
+        return left
+    
+    max_overlap = max_overlap or config.CHUNK_OVERLAP
+    tail = left[-max_overlap:]
+    head = right[:max_overlap]
+    
+    # 在左块尾部与右块头部之间寻找公共片段作为重叠区；重叠区应位于左块末尾、
+    # 右块开头，两侧只允许少量边界处被截断的文字
+    slack = max(max_overlap // 3, min_match)
+    matcher = difflib.SequenceMatcher(None, tail, head, autojunk=False)
+    best = None
+    for block in matcher.get_matching_blocks():
+        if block.size < min_match:
+            continue
+        if len(tail) - (block.a + block.size) > slack or block.b > slack:
+            continue
+        if best is None or block.size > best.size:
+            best = block
+    
+    if best is None:
+        return left + right
+    
+    cut = len(left) - len(tail) + best.a + best.size
+    return left[:cut] + right[best.b + best.size:]
+
+def stitch_texts(texts, max_overlap=None):
+    """按顺序拼接多个分块的文本"""
+    result = ""
+    for text in texts:
+        result = merge_overlap(result, text.strip(), max_overlap)
+    return result
+
+def split_sentences(text):
+    """按句末标点切分句子，保留标点"""
+    return [s for s in SENTENCE_PATTERN.findall(text) if s.strip()]
+
+def chunk_sentences(sentences, max_length=None, overlap=None, measure=len, average_length=None):
+    """按句子边界将文本打包为不超过max_length的分块，返回[(上文, 正文)]；
+    长度由measure计算（默认为字数，也可以是估计的token数），average_length为同一单位下的平均句长；
+    上文为前一分块末尾不超过overlap字的句子，仅用于提供语境"""
+    max_length = max_length or config.MAX_TEXT_LENGTH
+    overlap = config.CHUNK_OVERLAP if overlap is None else overlap
+    average_length = average_length or AVERAGE_SENTENCE_LENGTH
+    
+    # 超长的句子按长度硬切分
+    pieces = []
+    for sentence in sentences:
+        size = measure(sentence)
+        while size > max_length:
+            cut = max(int(len(sentence) * max_length / size), 1)
+            while cut > 1 and measure(sentence[:cut]) > max_length:
+                cut = max(int(cut * 0.9), 1)
+            pieces.append((sentence[:cut], measure(sentence[:cut])))
+            sentence = sentence[cut:]
+            size = measure(sentence)
+        if sentence:
+            pieces.append((sentence, size))
+    
+    # 分块边界由句子内容决定：达到一半长度后，在哈希值满足条件的句子之后切分。
+    # 修改某段文字只影响所在分块，其余分块保持不变，可继续命中缓存
+    divisor = max(max_length // 4 // average_length, 1)
+    chunks = []
+    current = []
+    length = 0
+    for piece, size in pieces:
+        if current and length + size > max_length:
+            chunks.append(current)
+            current = []
+            length = 0
+        current.append(piece)
+        length += size
+        if length >= max_length // 2 and zlib.crc32(piece.strip().encode('utf-8')) % divisor == 0:
+            chunks.append(current)
+            current = []
+            length = 0
+    if current:
+        chunks.append(current)
+    
+    result = []
+    for index, chunk in enumerate(chunks):
+        context = []
+        if index > 0:
+            context_length = 0
+            for piece in reversed(chunks[index - 1]):
+                if context_length + len(piece) > overlap:
+                    break
+                context.insert(0, piece)
+                context_length += len(piece)
+        result.append((''.join(context), ''.join(chunk)))
+    return result
+
+def chunk_for_optimization(text):
+    """将待优化的文本分块：按估计的token数打包，使每次请求接近输出上限而不被截断；
+    OPTIMIZE_CHUNK_TOKENS为0时按MAX_TEXT_LENGTH字数分块"""
+    sentences = split_sentences(text)
+    chunk_tokens = settings.get('OPTIMIZE_CHUNK_TOKENS')
+    if not chunk_tokens:
+        return chunk_sentences(sentences)
+    # 优化结果与原文长度相近，分块不能超过单次输出上限
+    chunk_tokens = min(chunk_tokens, settings.get('OPTIMIZE_MAX_TOKENS'))
+    return chunk_sentences(sentences, chunk_tokens, measure=estimate_tokens,
+                           average_length=max(int(AVERAGE_SENTENCE_LENGTH * CJK_TOKENS_PER_CHAR), 1))
+
+def drop_repeated_sentences(left, right, window=5, threshold=0.8):
+    """去除右块开头与左块末尾重复的句子，返回右块剩余的文字"""
+    if not left or not right:
+        return right
+    
+    tail = split_sentences(left)[-window:]
+    head = [m for m in SENTENCE_PATTERN.finditer(right) if m.group().strip()][:window]
+    
+    def similar(a, b):
+        # 忽略标点与空白，模型改写标点不影响判断
+        a = PUNCTUATION_PATTERN.sub('', a)
+        b = PUNCTUATION_PATTERN.sub('', b)
+        return bool(a) and difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= threshold
+    
+    # 从最长的重复开始检查：右块开头的k句与左块末尾的k句逐句相似
+    for k in range(min(len(tail), len(head)), 0, -1):
+        if all(similar(a, b.group()) for a, b in zip(tail[-k:], head[:k])):
+            return right[head[k - 1].end():]
+    return right
+
+def stitch_sentences(left, right, window=5, threshold=0.8):
+    """拼接相邻分块的优化结果，去除右块开头与左块末尾重复的句子"""
+    if not left:
+        return right
+    right = drop_repeated_sentences(left, right, window, threshold).lstrip()
+    if not right:
+        return left
+    return left.rstrip() + '\n' + right
+
+def _cut_point(text, max_length):
+    """超长文本的切分位置：优先取前max_length字中最后一个逗号或空白之后，过于靠前时直接按长度切"""
+    cut = 0
+    for match in SOFT_BREAK_PATTERN.finditer(text, max_length // 2, max_length):
+        cut = match.end()
+    return cut or max_length
+
+def iter_sentences(pieces, max_length=None):
+    """从逐段到达的文本（如语音识别的分块结果）中依次取出句子，保留标点；
+    超过max_length字的句子按长度切开"""
+    max_length = max_length or config.MAX_TEXT_LENGTH
+    pending = ""
+    for piece in pieces:
+        if not piece:
+            continue
+        # 未结束的部分中没有句末标点（末尾相连的标点除外），只需从末尾标点处开始查找
+        scan_from = len(pending.rstrip(SEGMENT_TERMINATORS))
+        buffer = pending + piece
+        start = 0
+        for match in SEGMENT_BOUNDARY.finditer(buffer, scan_from):
+            # 句末标点位于已到达文字的末尾时可能与下一段相连，等待更多文字
+            if match.end() == len(buffer):
+                break
+            # 有句末标点的超长句子同样按长度切开，与标点在后续文字中到达时的切法一致
+            while match.end() - start > max_length:
+                cut = start + _cut_point(buffer[start:start + max_length], max_length)
+                yield buffer[start:cut]
+                start = cut
+            yield buffer[start:match.end()]
+            start = match.end()
+        while len(buffer) - start > max_length:
+            cut = start + _cut_point(buffer[start:start + max_length], max_length)
+            yield buffer[start:cut]
+            start = cut
+        pending = buffer[start:]
+    if pending:
+        yield pending
+
+def segment_sentences(sentences, max_length=None, overlap=0):
+    """将句子流打包为不超过max_length字的分段并逐个产出；
+    overlap大于0时，每段开头重复上一段末尾不超过overlap字的句子"""
+    max_length = max_length or config.MAX_TEXT_LENGTH
+    overlap = min(overlap, max_length // 2)
+    budget = max_length - overlap
+    current = []
+    length = 0
+    carried = 0
+    for sentence in sentences:
+        # 超长的句子切开，保证与重复的上文合计不超过max_length
+        pieces = [sentence]
+        while len(pieces[-1]) > budget:
+            cut = _cut_point(pieces[-1][:budget], budget)
+            pieces[-1:] = [pieces[-1][:cut], pieces[-1][cut:]]
+        for piece in pieces:
+            if length + len(piece) > max_length and length > carried:
+                segment = ''.join(current).strip()
+                if segment:
+                    yield segment
+                context = []
+                carried = 0
+                for previous in reversed(current):
+                    if carried + len(previous) > overlap:
+                        break
+                    context.append(previous)
+                    carried += len(previous)
+                current = context[::-1]
+                length = carried
+            current.append(piece)
+            length += len(piece)
+    if length > carried:
+        segment = ''.join(current).strip()
+        if segment:
+            yield segment
+
+def segment_stream(pieces, max_length=None, overlap=0):
+    """流式分段：逐段读入文本，一次扫描产出不超过max_length字的分段"""
+    max_length = max_length or config.MAX_TEXT_LENGTH
+    return segment_sentences(iter_sentences(pieces, max_length), max_length, overlap)
 
 class TextProcessor:
     def __init__(self):
         self.api_key = config.DEEPSEEK_API_KEY
         self.api_base = config.DEEPSEEK_API_BASE
+        self.client = get_shared_client()
         
-    def optimize_text(self, raw_text):
-        """使用DeepSeek API优化文本内容"""
+        # 大模型响应缓存，相同的分块不重复请求
+        self.llm_cache = None
+        if settings.get('LLM_CACHE_ENABLED'):
+            self.llm_cache = LLMCache()
+        
+        # 最近一次优化的各分块原文与结果，修改原文后据此增量重新处理
+        self.last_chunks = None
+        
+    def _optimization_request(self, raw_text, context=None):
+        """生成文本优化的请求数据和缓存键；context为上文，仅提供语境不参与输出"""
+        context_text = ""
+        if context:
+            context_text = f"""
+        上文（仅供理解语境，不要输出）：
+        {context}
+        """
+        
+        prompt = f"""
+        请对以下培训视频的文字内容进行优化，使其更加规范、清晰和专业：
+        {context_text}
+        原文：
+        {raw_text}
+        
+        要求：
+        1. 保持原意不变
+        2. 修正语法错误和表达不清的地方
+        3. 使用更专业的培训术语
+        4. 保持逻辑清晰，结构合理
+        5. 确保内容适合作为培训脚本使用
+        
+        请直接返回优化后的文本，不要添加其他说明。
+        """
+        
+        data = {
+            'model': OPTIMIZE_MODEL,
+            'messages': [
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': OPTIMIZE_TEMPERATURE,
+            'max_tokens': settings.get('OPTIMIZE_MAX_TOKENS')
+        }
+        
+        # 缓存键只包含本块原文，上文变化（相邻分块被修改）不影响命中
+        cache_key = None
+        if self.llm_cache is not None:
+            cache_key = self.llm_cache.key_for(
+                data['model'], OPTIMIZE_PROMPT_VERSION,
+                {'temperature': data['temperature'], 'max_tokens': data['max_tokens']}, raw_text)
+        return data, cache_key
+    
+    def request_optimization(self, raw_text, context=None):
+        """调用DeepSeek API优化一段文本，失败时抛出异常"""
+        data, cache_key = self._optimization_request(raw_text, context)
+        if cache_key is not None:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                return cached['content']
+        
+        response = self.client.post("/v1/chat/completions", json=data)
+        
+        if response.status_code == 200:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            if result['choices'][0].get('finish_reason') == 'length':
+                raise Exception("文本优化结果超出max_tokens被截断")
+            if cache_key is not None:
+                self.llm_cache.set(cache_key, {'content': content})
+            return content
+        else:
+            raise Exception(f"文本优化API调用失败: {response.status_code}")
+    
+    def stream_optimization(self, raw_text, context=None):
+        """以流式（SSE）方式优化一段文本，逐段产出生成的文字，失败时抛出异常"""
+        data, cache_key = self._optimization_request(raw_text, context)
+        if cache_key is not None:
+            cached = self.llm_cache.get(cache_key)
+            if cached is not None:
+                yield cached['content']
+                return
+        
+        data['stream'] = True
+        response = self.client.post("/v1/chat/completions", json=data, stream=True)
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            prompt = f"""
-            请对以下培训视频的文字内容进行优化，使其更加规范、清晰和专业：
-            
-            原文：
-            {raw_text}
-            
-            要求：
-            1. 保持原意不变
-            2. 修正语法错误和表达不清的地方
-            3. 使用更专业的培训术语
-            4. 保持逻辑清晰，结构合理
-            5. 确保内容适合作为培训脚本使用
-            
-            请直接返回优化后的文本，不要添加其他说明。
-            """
-            
-            data = {
-                'model': 'deepseek-chat',
-                'messages': [
-                    {'role': 'user', 'content': prompt}
-                ],
-                'temperature': 0.3,
-                'max_tokens': 4000
-            }
-            
-            response = requests.post(
-                f"{self.api_base}/v1/chat/completions",
-                headers=headers,
-                json=data
-            )
+            if response.status_code != 200:
+                raise Exception(f"文本优化API调用失败: {response.status_code}")
             
-            if response.status_code == 200:
-                result = response.json()
-                optimized_text = result['choices'][0]['message']['content']
-                return optimized_text
-            else:
-                # 如果API调用失败，返回原文
-                print(f"文本优化API调用失败: {response.status_code}")
-                return raw_text
-                
-        except Exception as e:
-            print(f"文本优化失败: {str(e)}")
-            return raw_text
+            parts = []
+            finish_reason = None
+            for line in response.iter_lines():
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
+                    break
+                choices = json.loads(payload).get('choices') or [{}]
+                finish_reason = choices[0].get('finish_reason') or finish_reason
+                delta = (choices[0].get('delta') or {}).get('content')
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            response.close()
+        
+        if finish_reason == 'length':
+            raise Exception("文本优化结果超出max_tokens被截断")
+        
+        # 完整生成后才写入缓存
+        if cache_key is not None:
+            self.llm_cache.set(cache_key, {'content': ''.join(parts)})
     
-    def segment_text(self, text):
-        """将文本分段处理"""
-        # 按句号、问号、感叹号分割
-        sentences = re.split(r'[。！？]', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+    # 带任务检查点的流程直接调用本方法，因此在此计时
+    @instrumentation.traced('optimize_text', bytes_in=lambda args: instrumentation.text_size(args['raw_text']),
+                            bytes_out=instrumentation.text_size)
+    def optimize_chunked(self, raw_text):
+        """按句子边界分块并发优化，按顺序拼接；任一分块失败时抛出异常"""
+        chunks = chunk_for_optimization(raw_text) or [('', raw_text)]
+        if len(chunks) > 1:
+            print(f"文本分为 {len(chunks)} 块并发优化")
+        outputs = self._optimize_chunks(chunks)
+        self._record_chunks(chunks, outputs)
         
-        # 按段落长度和语义进行分组
-        segments = []
-        current_segment = ""
+        result = ""
+        for output in outputs:
+            result = stitch_sentences(result, output.strip())
+        return result
+    
+    def _optimize_chunks(self, chunks, fallback=False):
+        """并发优化多个分块，按顺序返回结果；fallback为True时失败的分块返回None，否则抛出异常"""
+        def optimize(chunk):
+            try:
+                return self.request_optimization(chunk[1], chunk[0])
+            except Exception as e:
+                if not fallback:
+                    raise
+                print(f"分块优化失败: {str(e)}")
+                return None
         
-        for sentence in sentences:
-            if len(current_segment) + len(sentence) < config.MAX_TEXT_LENGTH:
-                current_segment += sentence + "。"
-            else:
-                if current_segment:
-                    segments.append(current_segment.strip())
-                current_segment = sentence + "。"
+        if len(chunks) == 1:
+            return [optimize(chunks[0])]
+        workers = max(settings.get('OPTIMIZE_WORKERS'), 1)
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(chunks)), 1)) as executor:
+            return list(executor.map(instrumentation.bind(optimize), chunks))
+    
+    def _record_chunks(self, chunks, outputs):
+        """记录各分块的原文与优化结果"""
+        self.last_chunks = [{'raw': body, 'optimized': output}
+                            for (_, body), output in zip(chunks, outputs)]
+    
+    def optimize_text_stream(self, raw_text):
+        """流式优化文本，按顺序逐段产出优化后的文字；各分块并发生成，当前分块边生成边输出"""
+        chunks = chunk_for_optimization(raw_text)
+        tracer = instrumentation.get_tracer()
+        span = tracer.start_span('optimize_text', bytes_in=instrumentation.text_size(raw_text))
+        stop = threading.Event()
+        queues = [queue.Queue() for _ in chunks]
         
-        if current_segment:
-            segments.append(current_segment.strip())
+        def produce(index):
+            context, body = chunks[index]
+            stream = self.stream_optimization(body, context)
+            try:
+                for delta in stream:
+                    if stop.is_set():
+                        return
+                    queues[index].put(delta)
+                queues[index].put(None)
+            except Exception as e:
+                queues[index].put(e)
+            finally:
+                stream.close()
         
-        return segments
+        workers = max(settings.get('OPTIMIZE_WORKERS'), 1)
+        executor = ThreadPoolExecutor(max_workers=max(min(workers, len(chunks)), 1))
+        text = ""
+        outputs = [[] for _ in chunks]
+        error = None
+        try:
+            for index in range(len(chunks)):
+                executor.submit(instrumentation.bind_span(produce, span), index)
+            
+            for index, deltas in enumerate(queues):
+                # 后续分块开头可能重复上文，先缓存几句，去重后再输出
+                buffer = ""
+                flushed = index == 0
+                # 与非流式拼接一致：去掉分块首尾的空白；末尾空白暂不输出，分块结束时丢弃
+                started = False
+                held = ""
+                while True:
+                    item = deltas.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    if item is None:
+                        break
+                    outputs[index].append(item)
+                    if not flushed:
+                        buffer += item
+                        if len(split_sentences(buffer)) <= 5:
+                            continue
+                        item = self._join_stream_piece(text, buffer)
+                        flushed = True
+                    elif not started:
+                        item = item.lstrip()
+                    piece, held = self._hold_trailing_space(item, held)
+                    started = started or bool(item)
+                    if piece:
+                        text += piece
+                        yield piece
+                if not flushed and buffer:
+                    piece = self._join_stream_piece(text, buffer).rstrip()
+                    text += piece
+                    if piece:
+                        yield piece
+            self._record_chunks(chunks, [''.join(parts) for parts in outputs])
+        except BaseException as e:
+            error = str(e) or e.__class__.__name__
+            raise
+        finally:
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+            span.set('bytes_out', instrumentation.text_size(text))
+            if tracer.enabled:
+                tracer.end_span(span, error)
+    
+    def _join_stream_piece(self, text, buffer):
+        """去除分块开头重复的句子，返回接在已输出文字之后的部分（与stitch_sentences的拼接方式相同）"""
+        remainder = drop_repeated_sentences(text, buffer.lstrip()).lstrip()
+        if not remainder:
+            return ""
+        return '\n' + remainder if text.rstrip() else remainder
+    
+    def _hold_trailing_space(self, piece, held):
+        """返回(可以输出的文字, 暂缓输出的末尾空白)；空白之后出现文字时才一并输出"""
+        core = piece.rstrip()
+        if not core:
+            return "", held + piece
+        return held + core, piece[len(core):]
+    
+    def _optimize(self, raw_text, on_delta=None):
+        """优化文本；指定on_delta时以流式方式生成，每生成一段文字调用一次on_delta"""
+        if on_delta is None or not settings.get('OPTIMIZE_STREAM'):
+            return self.optimize_chunked(raw_text)
+        parts = []
+        for delta in self.optimize_text_stream(raw_text):
+            parts.append(delta)
+            on_delta(delta)
+        return ''.join(parts)
+    
+    def optimize_text(self, raw_text, on_delta=None):
+        """使用DeepSeek API优化文本内容"""
+        try:
+            return self._optimize(raw_text, on_delta)
+        except Exception as e:
+            # 如果API调用失败，返回原文
+            print(f"文本优化失败: {str(e)}")
+            self.last_chunks = None
+            return raw_text
+    
+    def segment_text(self, text, overlap=0):
+        """将文本分段处理；text可以是字符串，也可以是逐段到达的文本序列，按生成器方式逐个产出分段"""
+        pieces = [text] if isinstance(text, str) else text
+        return segment_stream(pieces, config.MAX_TEXT_LENGTH, overlap)
     
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.text_size(args['text']),
+                            bytes_out=instrumentation.json_size)
     def analyze_structure(self, text):
         """分析文本结构，识别章节"""
-        # 常见的章节关键词
-        chapter_keywords = [
-            '第一部分', '第二部分', '第三部分',
-            '第一步', '第二步', '第三步',
-            '首先', '其次', '然后', '最后',
-            '培训目标', '操作步骤', '注意事项', '总结',
-            '设备介绍', '安全要求', '操作流程', '维护保养'
-        ]
-        
-        segments = self.segment_text(text)
+        return self.merge_sections(self.detect_sections(text))
+    
+    def detect_sections(self, text):
+        """将文本分段并识别各段开头的章节关键词，返回[(关键词或None, 分段)]"""
+        # 章节关键词编译为匹配自动机，各次调用复用
+        keyword_index = get_keyword_index(settings.get('SECTION_KEYWORDS_FILE'))
+        
+        parts = []
+        for segment in self.segment_text(text):
+            # 检查是否包含章节关键词，只检查前50个字符
+            match = keyword_index.find(segment, 50)
+            parts.append((match[1] if match is not None else None, segment))
+        return parts
+    
+    def merge_sections(self, parts):
+        """按识别出的章节关键词将分段归入各章节"""
         structured_content = {
             'title': '技能操作培训脚本',
             'sections': []
@@ -105,21 +544,11 @@ class TextProcessor:
             'content': []
         }
         
-        for segment in segments:
-            # 检查是否包含章节关键词
-            is_new_section = False
-            section_title = None
-            
-            for keyword in chapter_keywords:
-                if keyword in segment[:50]:  # 只检查前50个字符
-                    is_new_section = True
-                    section_title = keyword
-                    break
-            
-            if is_new_section and current_section['content']:
+        for title, segment in parts:
+            if title is not None and current_section['content']:
                 structured_content['sections'].append(current_section)
                 current_section = {
-                    'title': section_title,
+                    'title': title,
                     'content': [segment]
                 }
             else:
@@ -130,14 +559,111 @@ class TextProcessor:
         
         return structured_content
     
-    def process_text(self, raw_text):
-        """完整的文本处理流程"""
-        print("正在进行文本优化...")
-        optimized_text = self.optimize_text(raw_text)
+    @instrumentation.traced(bytes_in=lambda args: instrumentation.text_size(args['raw_text']),
+                            bytes_out=instrumentation.json_size)
+    def reprocess_text(self, raw_text):
+        """原始文本修改后增量重新处理：与上次优化的分块逐块比较，
+        只重新优化有修改的分块并重新分析其结构，未修改分块的结果直接复用"""
+        previous = self.last_chunks
+        if not previous:
+            return self.process_text(raw_text)
         
-        print("正在分析文本结构...")
-        structured_content = self.analyze_structure(optimized_text)
+        chunks = chunk_for_optimization(raw_text) or [('', raw_text)]
+        entries = [None] * len(chunks)
+        matcher = difflib.SequenceMatcher(None, [entry['raw'] for entry in previous],
+                                          [body for _, body in chunks], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for offset in range(i2 - i1):
+                    # 上次优化失败的分块重新请求
+                    if previous[i1 + offset]['optimized'] is not None:
+                        entries[j1 + offset] = dict(previous[i1 + offset])
+        
+        changed = [index for index, entry in enumerate(entries) if entry is None]
+        print(f"原始文本共 {len(chunks)} 块，其中 {len(changed)} 块有修改，重新优化")
+        if changed:
+            outputs = self._optimize_chunks([chunks[index] for index in changed], fallback=True)
+            for index, output in zip(changed, outputs):
+                entries[index] = {'raw': chunks[index][1], 'optimized': output}
+        
+        self.last_chunks = entries
+        return self.analyze_chunks(entries)
+    
+    @instrumentation.traced('analyze_structure', bytes_out=instrumentation.json_size)
+    def analyze_chunks(self, entries):
+        """按分块分析文本结构：按顺序拼接各分块的优化结果，拼接后与上次相同的分块复用已识别的章节"""
+        result = ""
+        parts = []
+        analyzed = 0
+        for entry in entries:
+            text = (entry['optimized'] if entry['optimized'] is not None else entry['raw']).strip()
+            piece = drop_repeated_sentences(result, text).lstrip() if result else text
+            if entry.get('piece') != piece or entry.get('sections') is None:
+                entry['piece'] = piece
+                entry['sections'] = self.detect_sections(piece)
+                analyzed += 1
+            parts.extend(entry['sections'])
+            if piece:
+                result = result.rstrip() + '\n' + piece if result else piece
+        if analyzed < len(entries):
+            print(f"重新分析 {analyzed} 块的文本结构")
+        return self.merge_sections(parts)
+    
+    def _analyze_optimized(self, optimized_text):
+        """分析优化后文本的结构；有分块结果时按分块分析，便于修改原文后增量重新处理"""
+        if self.last_chunks:
+            return self.analyze_chunks(self.last_chunks)
+        return self.analyze_structure(optimized_text)
+    
+    def process_text(self, raw_text, job=None, on_delta=None):
+        """完整的文本处理流程；指定任务时复用已保存的阶段结果，指定on_delta时流式输出优化文本"""
+        self.last_chunks = None
+        if job is None:
+            print("正在进行文本优化...")
+            optimized_text = self.optimize_text(raw_text, on_delta)
+            
+            print("正在分析文本结构...")
+            return self._analyze_optimized(optimized_text)
+        
+        # 提示词、模型或章节关键词变化后，已保存的优化文本与结构化内容不再可用
+        job.check_settings('optimize', {
+            'prompt_version': OPTIMIZE_PROMPT_VERSION,
+            'model': OPTIMIZE_MODEL,
+            'temperature': OPTIMIZE_TEMPERATURE,
+            'max_tokens': settings.get('OPTIMIZE_MAX_TOKENS')
+        }, 'optimized', 'structured')
+        keyword_index = get_keyword_index(settings.get('SECTION_KEYWORDS_FILE'))
+        job.check_settings('structure', {
+            'keywords': make_key(keyword_index.keywords)
+        }, 'structured')
         
+        structured_content = job.load_structured()
+        if structured_content is not None:
+            print("使用已保存的结构化内容")
+            # 恢复分块结果，之后修改原文仍可增量重新处理
+            self.last_chunks = job.load_optimized_chunks()
+            return structured_content
+        
+        optimized_text = job.load_text('optimized')
+        if optimized_text is None:
+            print("正在进行文本优化...")
+            try:
+                optimized_text = self._optimize(raw_text, on_delta)
+                job.save_optimized_chunks(self.last_chunks or [])
+                job.save_text('optimized', optimized_text)
+            except Exception as e:
+                # 优化失败时使用原文继续，但不保存检查点，下次重新优化
+                print(f"文本优化失败: {str(e)}")
+                self.last_chunks = None
+                optimized_text = raw_text
+        else:
+            print("使用已保存的优化文本")
+            self.last_chunks = job.load_optimized_chunks()
+        
+        print("正在分析文本结构...")
+        structured_content = self._analyze_optimized(optimized_text)
+        if job.completed('optimized'):
+            job.save_structured(structured_content)
         return structured_content
 
 class MockTextProcessor:
@@ -145,10 +671,10 @@ class MockTextProcessor:
     def __init__(self):
         pass
     
-    def process_text(self, raw_text):
-        """模拟文本处理"""
+    def process_text(self, raw_text, job=None, on_delta=None):
+        """模拟文本处理；指定on_delta时按句模拟流式输出优化文本"""
         # 模拟优化后的结构化内容
-        return {
+        structured_content = {
             'title': '技能操作培训脚本',
             'sections': [
                 {
@@ -200,4 +726,14 @@ class MockTextProcessor:
                     ]
                 }
             ]
-        } 
\ No newline at end of file
+        }
+        
+        if on_delta is not None:
+            sentences = [item for section in structured_content['sections'] for item in section['content']]
+            for i, sentence in enumerate(sentences):
+                on_delta(sentence if i == 0 else '\n' + sentence)
+        return structured_content
+    
+    def reprocess_text(self, raw_text):
+        """模拟增量重新处理"""
+        return self.process_text(raw_text)
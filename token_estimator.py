@@ -0,0 +1,23 @@
+import re
+import math
+import settings
+
+# 按DeepSeek官方给出的换算比例估计token数：中文字符约0.6个token，英文字符约0.3个token
+CJK_TOKENS_PER_CHAR = 0.6
+ASCII_TOKENS_PER_CHAR = 0.3
+# 其他字符（如日文假名、emoji、全角符号以外的Unicode字符）按每字1个token保守估计
+OTHER_TOKENS_PER_CHAR = 1.0
+
+# 中日韩统一表意文字及中文标点、全角字符
+CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+def estimate_tokens(text):
+    """估计文本在deepseek-chat分词器下的token数（偏保守，向上取整）"""
+    if not text:
+        return 0
+    ascii_count = len(text.encode('ascii', 'ignore'))
+    cjk_count = CJK_PATTERN.subn('', text)[1]
+    other_count = len(text) - ascii_count - cjk_count
+    tokens = (cjk_count * CJK_TOKENS_PER_CHAR + ascii_count * ASCII_TOKENS_PER_CHAR
+              + other_count * OTHER_TOKENS_PER_CHAR)
+    return math.ceil(tokens * settings.get('TOKEN_ESTIMATE_SCALE'))
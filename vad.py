@@ -0,0 +1,167 @@
+import numpy as np
+import settings
+import audio_utils
+
+FULL_SCALE = 32768.0
+ENERGY_BATCH_FRAMES = 10000  # 每批计算能量的帧数，避免一次性把整段音频转为浮点数
+
+def read_wav_samples(wav_path):
+    """以内存映射方式读取16位PCM WAV文件，返回(采样数组, 采样率)"""
+    fmt, offset, size = audio_utils.read_wav_header(wav_path)
+    if fmt['bits'] != 16:
+        raise ValueError(f"仅支持16位PCM音频: {wav_path}")
+    channels = fmt['channels']
+    sample_rate = fmt['sample_rate']
+
+    frame_bytes = 2 * channels
+    frames = size // frame_bytes
+    if frames == 0:
+        return np.zeros(0, dtype='<i2'), sample_rate
+
+    samples = np.memmap(wav_path, dtype='<i2', mode='r', offset=offset,
+                        shape=(frames, channels))
+    return samples[:, 0], sample_rate
+
+def close_samples(samples):
+    """关闭read_wav_samples返回的内存映射；关闭后不可再访问采样数据（Windows上映射未关闭时无法删除文件）"""
+    base = samples
+    while base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    mm = getattr(base, '_mmap', None)
+    if mm is not None:
+        mm.close()
+
+def frame_energy_db(samples, frame_length):
+    """按帧计算音频能量（dBFS）"""
+    n_frames = len(samples) // frame_length
+    energies = np.empty(n_frames, dtype=np.float32)
+
+    for begin in range(0, n_frames, ENERGY_BATCH_FRAMES):
+        end = min(begin + ENERGY_BATCH_FRAMES, n_frames)
+        frames = np.asarray(samples[begin * frame_length:end * frame_length], dtype=np.float32)
+        frames = frames.reshape(end - begin, frame_length) / FULL_SCALE
+        power = np.einsum('ij,ij->i', frames, frames) / frame_length
+        energies[begin:end] = 10.0 * np.log10(power + 1e-10)
+
+    return energies
+
+def detect_speech_regions(samples, sample_rate, frame_ms=None, threshold_db=None,
+                          min_speech_ms=None, min_silence_ms=None, padding_ms=None):
+    """基于能量检测语音区域，返回[(起始采样, 结束采样), ...]"""
+    frame_ms = frame_ms or settings.get('VAD_FRAME_MS')
+    threshold_db = threshold_db if threshold_db is not None else settings.get('VAD_THRESHOLD_DB')
+    min_speech_ms = min_speech_ms if min_speech_ms is not None else settings.get('VAD_MIN_SPEECH_MS')
+    min_silence_ms = min_silence_ms if min_silence_ms is not None else settings.get('VAD_MIN_SILENCE_MS')
+    padding_ms = padding_ms if padding_ms is not None else settings.get('VAD_PADDING_MS')
+
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+    energies = frame_energy_db(samples, frame_length)
+    if len(energies) == 0:
+        return []
+
+    # 自适应阈值：噪声底（能量的低分位数）加上固定余量，且不低于绝对下限
+    min_energy_db = settings.get('VAD_MIN_ENERGY_DB')
+    noise_floor, speech_level = np.percentile(energies, [10, 90])
+    threshold = noise_floor + threshold_db
+    if speech_level <= threshold:
+        # 能量起伏不足，说明没有明显的静音段，只按绝对下限判断
+        threshold = min_energy_db
+    threshold = max(threshold, min_energy_db)
+    active = energies > threshold
+
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    # 合并间隔过短的静音
+    min_silence = int(np.ceil(min_silence_ms / frame_ms))
+    keep = (starts[1:] - ends[:-1]) >= min_silence
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    # 去除过短的语音片段
+    min_speech = int(np.ceil(min_speech_ms / frame_ms))
+    keep = (ends - starts) >= min_speech
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0:
+        return []
+
+    # 前后填充，填充后相互重叠的区域再次合并
+    padding = int(padding_ms / frame_ms)
+    starts = np.maximum(starts - padding, 0)
+    ends = np.minimum(ends + padding, len(energies))
+    keep = starts[1:] > ends[:-1]
+    starts = np.concatenate((starts[:1], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], ends[-1:]))
+
+    total = len(samples)
+    return [(int(s) * frame_length, min(int(e) * frame_length, total))
+            for s, e in zip(starts, ends)]
+
+def _build_chunk(samples, pieces, sample_rate, gap, overlap):
+    """拼接若干语音片段为一个分块，并记录时间戳映射"""
+    parts = []
+    segments = []  # [(分块内偏移秒数, 原始起始秒数, 时长秒数)]
+    offset = 0
+    for i, (start, end) in enumerate(pieces):
+        if i > 0:
+            parts.append(gap)
+            offset += len(gap)
+        parts.append(np.asarray(samples[start:end], dtype='<i2'))
+        segments.append((offset / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        offset += end - start
+
+    return {
+        'start': pieces[0][0] / sample_rate,
+        'end': pieces[-1][1] / sample_rate,
+        'pcm': np.concatenate(parts).tobytes(),
+        'overlap': overlap,
+        'segments': segments
+    }
+
+def iter_speech_chunks(samples, regions, sample_rate, chunk_seconds, overlap_seconds=0):
+    """将语音区域打包为上传分块，产出带时间戳映射的分块"""
+    chunk_length = int(chunk_seconds * sample_rate)
+    overlap_length = int(overlap_seconds * sample_rate)
+    gap = np.zeros(int(settings.get('VAD_JOIN_GAP_MS') * sample_rate / 1000), dtype='<i2')
+
+    pieces = []  # 当前分块中的语音片段 [(起始采样, 结束采样)]
+    length = 0
+    overlap = False
+
+    for start, end in regions:
+        position = start
+        # 超过分块时长的语音区域按带重叠的窗口切分
+        while end - position > chunk_length:
+            if pieces:
+                yield _build_chunk(samples, pieces, sample_rate, gap, overlap)
+                pieces = []
+            window = [(position, position + chunk_length)]
+            yield _build_chunk(samples, window, sample_rate, gap, position != start)
+            position += chunk_length - overlap_length
+
+        piece_length = end - position
+        if position != start and piece_length <= overlap_length:
+            continue  # 剩余部分已完全包含在上一个窗口的重叠区内
+        if pieces and length + len(gap) + piece_length > chunk_length:
+            yield _build_chunk(samples, pieces, sample_rate, gap, overlap)
+            pieces = []
+
+        if pieces:
+            length += len(gap) + piece_length
+        else:
+            length = piece_length
+            overlap = position != start
+        pieces.append((position, end))
+
+    if pieces:
+        yield _build_chunk(samples, pieces, sample_rate, gap, overlap)
+
+def to_original_time(chunk, seconds):
+    """将分块内的时间换算为原始音频时间轴上的时间"""
+    for offset, original_start, duration in reversed(chunk['segments']):
+        if seconds >= offset:
+            return original_start + min(seconds - offset, duration)
+    return chunk['start']